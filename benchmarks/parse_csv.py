@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the ways of parsing an uploaded CSV file:
+
+- python: header sniffing and the python engine, which sniffs the separator
+  itself. It is how datasets used to be read.
+- dialect: dialect detection on a bounded sample, then the python engine. It
+  is how the preview of a dataset is read.
+- c: dialect detection, then the C engine. It is how whole datasets are read
+  when they have no columnar copy.
+- pyarrow: dialect detection, then pyarrow's streaming CSV reader. It is how
+  the whole file is read to write the columnar copy of a dataset.
+
+Usage: python benchmarks/parse_csv.py [FILE ...]
+"""
+import csv
+import sys
+import timeit
+from io import BytesIO, TextIOWrapper
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
+
+from datasets.dialect import detect_dialect
+
+DEFAULT_FILES = ["samples/imdb.csv", "samples/reports_contexts.csv"]
+PREVIEW_ROWS = 100
+REPEAT = 5
+
+
+def python_engine(data, nrows):
+    """Sniffs the header, then parses with the python engine."""
+    file = TextIOWrapper(BytesIO(data))
+    header = csv.Sniffer().has_header(file.readline() + file.readline())
+    file.seek(0)
+    return pd.read_csv(
+        file,
+        sep=None,
+        header="infer" if header else None,
+        engine="python",
+        nrows=nrows,
+    )
+
+
+def dialect_engine(data, nrows):
+    """Detects the dialect, then parses with the python engine."""
+    return _read_with_dialect(data, nrows, engine="python")
+
+
+def c_engine(data, nrows):
+    """Detects the dialect, then parses with the C engine."""
+    return _read_with_dialect(data, nrows, engine="c")
+
+
+def _read_with_dialect(data, nrows, engine):
+    file = BytesIO(data)
+    dialect = detect_dialect(file)
+    return pd.read_csv(
+        file,
+        sep=dialect["sep"],
+        quotechar=dialect["quotechar"],
+        header="infer" if dialect["header"] else None,
+        engine=engine,
+        nrows=nrows,
+    )
+
+
+def pyarrow_reader(data, nrows=None):
+    """Detects the dialect, then parses with pyarrow's streaming reader."""
+    file = BytesIO(data)
+    dialect = detect_dialect(file)
+    reader = pcsv.open_csv(
+        file,
+        read_options=pcsv.ReadOptions(autogenerate_column_names=not dialect["header"]),
+        parse_options=pcsv.ParseOptions(
+            delimiter=dialect["sep"],
+            quote_char=dialect["quotechar"],
+            newlines_in_values=True,
+        ),
+    )
+    return pa.Table.from_batches(list(reader)).to_pandas()
+
+
+def best_of(func, data, nrows):
+    """The best time of a few runs, in milliseconds."""
+    timer = timeit.Timer(lambda: func(data, nrows))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number * 1000
+
+
+def main(files):
+    print(
+        f"{'file':<32}{'rows':>8}{'python (ms)':>14}{'dialect (ms)':>15}"
+        f"{'c (ms)':>10}{'pyarrow (ms)':>15}"
+    )
+    for path in files:
+        with open(path, "rb") as file:
+            data = file.read()
+
+        python = best_of(python_engine, data, PREVIEW_ROWS)
+        dialect = best_of(dialect_engine, data, PREVIEW_ROWS)
+        c = best_of(c_engine, data, PREVIEW_ROWS)
+        print(f"{path:<32}{PREVIEW_ROWS:>8}{python:>14.1f}{dialect:>15.1f}{c:>10.1f}{'-':>15}")
+
+        python = best_of(python_engine, data, None)
+        c = best_of(c_engine, data, None)
+        arrow = best_of(pyarrow_reader, data, None)
+        print(f"{path:<32}{'all':>8}{python:>14.1f}{'-':>15}{c:>10.1f}{arrow:>15.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DEFAULT_FILES)
@@ -4,13 +4,12 @@ import argparse
 import logging
 import os
 import sys
-import time
 from typing import Optional
 from pydantic import ValidationError
 
 
 import uvicorn
-from fastapi import FastAPI, File, Request, UploadFile
+from fastapi import FastAPI, File, Query, Request, UploadFile
 from fastapi.responses import (
     JSONResponse,
     PlainTextResponse,
@@ -18,21 +17,35 @@ from fastapi.responses import (
     StreamingResponse,
 )
 
-from datasets import __version__
-from datasets.columns import list_columns, update_column
+from datasets import __version__, metrics
+from datasets.columns import list_columns, update_column, update_columns
 from datasets.datasets import (
     create_dataset,
+    create_dataset_job,
     create_google_drive_dataset,
     download_dataset,
+    generate_name,
     get_dataset,
     get_featuretypes,
     list_datasets,
     patch_dataset,
+    release_name,
 )
-from datasets.exceptions import BadRequest, InternalServerError, NotFound
+from datasets.exceptions import (
+    ApiException,
+    BadRequest,
+    InternalServerError,
+    NotFound,
+)
+from datasets.executors import INGEST_POOL, METADATA_POOL, READ_POOL, run_in_pool
+from datasets.jobs import get_job
+from datasets.retry import retry
 from datasets.schemas import FileUploadValidate
+from datasets.serializers import JSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE, dataset_response
 from datasets.utils import to_snake_case
 
+CONTINUATION_TOKEN_HEADER = "X-Continuation-Token"
+
 app = FastAPI(
     title="PlatIAgro Datasets",
     description="These are the docs for PlatIAgro Datasets API."
@@ -40,8 +53,6 @@ app = FastAPI(
     version=__version__,
 )
 
-MAX_RETRIES = 10
-
 
 @app.get("/", response_class=PlainTextResponse)
 async def ping():
@@ -55,28 +66,88 @@ async def ping():
     return "pong"
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def handle_metrics():
+    """
+    Handles GET requests to /metrics.
+
+    Returns
+    -------
+    str
+        Metrics of this worker process, in the Prometheus text format.
+    """
+    return metrics.render()
+
+
 @app.get("/datasets")
-async def handle_list_datasets():
+async def handle_list_datasets(
+    prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+    token: Optional[str] = None,
+    include: Optional[str] = None,
+    column: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+):
     """
     Handles GET requests to /datasets.
 
+    Parameters
+    ----------
+    prefix : str
+        Lists only the datasets whose name starts with it.
+    limit : int
+        Max number of datasets.
+    token : str
+        The continuation token of the page, from the previous page.
+    include : str
+        "metadata" adds the filename, size, total, columns and times of each
+        dataset.
+    column : str
+        Lists only the datasets that have a column with this name.
+    sort : str
+        name, size, createdAt or updatedAt.
+    order : str
+        asc or desc.
+
     Returns
     -------
     str
+        The continuation token of the next page, if any, is in the
+        X-Continuation-Token header.
     """
-    return list_datasets()
+    datasets, next_token = await run_in_pool(
+        METADATA_POOL,
+        list_datasets,
+        prefix=prefix,
+        limit=limit,
+        token=token,
+        include=include,
+        column=column,
+        sort=sort,
+        order=order,
+    )
+    headers = {CONTINUATION_TOKEN_HEADER: next_token} if next_token else None
+    return JSONResponse(content=datasets, headers=headers)
 
 
 @app.post("/datasets")
 async def handle_post_datasets(
     request: Request,
     file: Optional[UploadFile] = File(None),
+    asynchronous: bool = Query(False, alias="async"),
 ):
     """
     Handles POST requests to /datasets.
 
     https://github.com/tiangolo/fastapi/blob/master/docs/en/docs/tutorial/request-files.md#:~:text=File%20parameters%20with%20UploadFile
 
+    Parameters
+    ----------
+    asynchronous : bool
+        Whether to answer with 202 Accepted as soon as the file is stored,
+        leaving parsing and featuretype inference to a background job.
+
     Returns
     -------
     str
@@ -84,22 +155,38 @@ async def handle_post_datasets(
 
     FileUploadValidate(file=file)
 
-
-    retries = 0
     if file:
-        while retries < MAX_RETRIES:
+        # if user does not select file, the browser also submits an empty
+        # part without filename: no name is reserved for it
+        if file.filename == "":
+            raise BadRequest("NoFile", "No selected file.")
+
+        try:
+            # the name is reserved once: retries store the dataset under it,
+            # rather than under a new name next to a partial dataset
+            name = await run_in_pool(INGEST_POOL, generate_name, file.filename)
             try:
-                return create_dataset(file)
-            except Exception as e:
-                logging.info(e)
-                logging.info("Something went wrong while uploading the file")
-                logging.info("Retrying processing upload")
-                logging.info(f"retries: {retries} of {MAX_RETRIES}")
-                # let's wait 1 sec before tryng again!
-                time.sleep(1)
-                retries = retries + 1
-
-        raise InternalServerError("FileUploadError", "Not able to handle file upload")
+                if asynchronous:
+                    job = await retry(
+                        "upload", run_in_pool, INGEST_POOL, create_dataset_job, file, name=name
+                    )
+                    return JSONResponse(status_code=202, content=job)
+                return await retry(
+                    "upload", run_in_pool, INGEST_POOL, dataset_response, create_dataset, file, name=name
+                )
+            except Exception:
+                try:
+                    await run_in_pool(INGEST_POOL, release_name, name)
+                except Exception:
+                    # the upload error is the one reported, not this one
+                    logging.exception(f"Could not release the dataset name {name}")
+                raise
+        except ApiException:
+            raise
+        except Exception:
+            logging.exception("Something went wrong while uploading the file")
+            metrics.increment("upload_failures_total")
+            raise InternalServerError("FileUploadError", "Not able to handle file upload")
 
     try:
         # request methods in fastapi are async by implementation
@@ -108,13 +195,41 @@ async def handle_post_datasets(
 
         kwargs = {to_snake_case(k): v for k, v in kwargs.items()}
         if kwargs:
-            return create_google_drive_dataset(**kwargs)
+            return await run_in_pool(
+                INGEST_POOL, dataset_response, create_google_drive_dataset, **kwargs
+            )
     except RuntimeError:
         raise BadRequest("NoFile", "No file part.")
 
 
+@app.get("/datasets/jobs/{job_id}")
+async def handle_get_job(job_id: str):
+    """
+    Handles GET requests to /datasets/jobs/{job_id}.
+
+    Parameters
+    ----------
+    job_id : str
+        The ingest job id.
+
+    Returns
+    -------
+    str
+    """
+    return await run_in_pool(METADATA_POOL, get_job, job_id)
+
+
 @app.get("/datasets/{name}")
-async def handle_get_dataset(name: str, page: int = 1, page_size: int = 10):
+async def handle_get_dataset(
+    name: str,
+    request: Request,
+    page: int = 1,
+    page_size: int = 10,
+    columns: Optional[str] = None,
+    expression: Optional[str] = Query(None, alias="filter"),
+    sort: Optional[str] = None,
+    order: str = "asc",
+):
     """
     Handles GET requests to /datasets/{name}.
 
@@ -122,16 +237,45 @@ async def handle_get_dataset(name: str, page: int = 1, page_size: int = 10):
     ----------
     name : str
         The dataset name.
+    request : Request
+        With page_size=-1, an Accept header of application/x-ndjson streams
+        the rows as NDJSON.
+    columns : str
+        Comma-separated names of the columns to return. Default to all.
+    expression : str
+        Returns only the rows that match this filter. Default to all.
+    sort : str
+        The column to sort the rows by. Default to the file order.
+    order : str
+        asc or desc.
 
     Returns
     -------
     str
     """
-    return get_dataset(name, page, page_size)
+    accept = request.headers.get("accept", "")
+    media_type = NDJSON_MEDIA_TYPE if NDJSON_MEDIA_TYPE in accept else JSON_MEDIA_TYPE
+    if columns is not None:
+        columns = columns.split(",")
+    return await run_in_pool(
+        READ_POOL,
+        dataset_response,
+        get_dataset,
+        name,
+        page,
+        page_size,
+        media_type=media_type,
+        columns=columns,
+        expression=expression,
+        sort=sort,
+        order=order,
+    )
 
 
 @app.patch("/datasets/{name}")
-async def handle_patch_dataset(name: str, featuretypes: UploadFile = File(...)):
+async def handle_patch_dataset(
+    name: str, featuretypes: UploadFile = File(...), preview: bool = False
+):
     """
     Handles PATCH requests to /datasets/{name}.
 
@@ -139,12 +283,19 @@ async def handle_patch_dataset(name: str, featuretypes: UploadFile = File(...)):
     ----------
     name : str
         The dataset name.
+    featuretypes : UploadFile
+        A text file with a featuretype per line.
+    preview : bool
+        Whether to return the first rows of the dataset. Default to False.
 
     Returns
     -------
     str
     """
-    return patch_dataset(name, featuretypes)
+    pool = READ_POOL if preview else METADATA_POOL
+    return await run_in_pool(
+        pool, dataset_response, patch_dataset, name, featuretypes, preview=preview
+    )
 
 
 @app.get("/datasets/{dataset}/columns")
@@ -161,7 +312,26 @@ async def handle_list_columns(dataset: str):
     -------
     str
     """
-    return list_columns(dataset)
+    return await run_in_pool(METADATA_POOL, list_columns, dataset)
+
+
+@app.patch("/datasets/{dataset}/columns")
+async def handle_patch_columns(dataset: str, request: Request):
+    """
+    Handles PATCH requests to /datasets/{dataset}/columns.
+
+    Parameters
+    ----------
+    dataset : str
+    request : Request
+        The featuretypes to set, by column name, as a JSON object.
+
+    Returns
+    -------
+    str
+    """
+    featuretypes = await request.json()
+    return await run_in_pool(METADATA_POOL, update_columns, dataset, featuretypes)
 
 
 @app.patch("/datasets/{dataset}/columns/{column}")
@@ -182,7 +352,9 @@ async def handle_patch_column(dataset: str, column: str, request: Request):
 
     body = await request.json()
     featuretype = body.get("featuretype")
-    return update_column(dataset, column, featuretype)
+    return await run_in_pool(
+        METADATA_POOL, update_column, dataset, column, featuretype
+    )
 
 
 @app.get("/datasets/{dataset}/featuretypes")
@@ -198,7 +370,7 @@ async def handle_get_featuretypes(dataset: str):
     -------
     str
     """
-    featuretypes = get_featuretypes(dataset)
+    featuretypes = await run_in_pool(METADATA_POOL, get_featuretypes, dataset)
     headers = {
         "Content-Type": "text/plain",
         "Content-Disposition": "attachment; filename=featuretypes.txt",
@@ -220,7 +392,7 @@ async def handle_download_dataset(name: str):
     urllib3.response.HTTPResponse object
         Streaming response with dataset content.
     """
-    streaming_response = download_dataset(name)
+    streaming_response = await run_in_pool(METADATA_POOL, download_dataset, name)
     return streaming_response
 
 
@@ -274,6 +446,7 @@ def enable_cors():
             "Access-Control-Allow-Methods"
         ] = "POST, GET, DELETE, PATCH, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type"
+        response.headers["Access-Control-Expose-Headers"] = CONTINUATION_TOKEN_HEADER
         return response
 
 
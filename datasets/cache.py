@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+In-process caches of dataset contents and metadata.
+
+Entries are kept per worker process.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from os import getenv
+
+from datasets import metrics
+from datasets.singleflight import SingleFlight
+
+DATASET_CACHE_SIZE = int(getenv("DATASET_CACHE_SIZE", str(256 * 1024 * 1024)))  # bytes
+SORT_CACHE_SIZE = int(getenv("SORT_CACHE_SIZE", str(64 * 1024 * 1024)))  # bytes
+METADATA_CACHE_TTL = float(getenv("METADATA_CACHE_TTL", "5"))  # seconds
+METADATA_CACHE_SIZE = int(getenv("METADATA_CACHE_SIZE", "1024"))  # datasets
+
+# caches that a dataset does not exist
+MISSING = object()
+
+
+class DatasetCache:
+    """
+    A least recently used cache of parsed datasets, or of arrays computed
+    from them, bounded by the memory they use.
+
+    Entries are keyed by dataset name and version (the checksum or ETag of the
+    stored object, possibly with what was computed from it), so that a
+    dataset that is stored again is never served from a stale entry. Cached
+    values are shared: callers must not modify them.
+
+    Parameters
+    ----------
+    max_size : int
+        The memory budget, in bytes.
+    metric : str
+        The prefix of the metrics of the cache. Default to "dataset_cache".
+    """
+
+    def __init__(self, max_size, metric="dataset_cache"):
+        self._max_size = max_size
+        self._metric = metric
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """Memory used by the cached values, in bytes."""
+        return self._size
+
+    def get(self, name, version):
+        """
+        Reads a dataset from the cache.
+
+        Parameters
+        ----------
+        name : str
+        version : str or tuple
+            None when the dataset version is unknown.
+
+        Returns
+        -------
+        pd.DataFrame or np.ndarray
+            None when the dataset is not cached.
+        """
+        if version is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get((name, version))
+            if entry is not None:
+                self._entries.move_to_end((name, version))
+
+        if entry is None:
+            metrics.increment(f"{self._metric}_misses_total")
+            return None
+        metrics.increment(f"{self._metric}_hits_total")
+        return entry[0]
+
+    def put(self, name, version, value):
+        """
+        Adds a dataset to the cache, evicting the least recently used ones
+        when the memory budget is exceeded. Datasets of unknown version, or
+        larger than the whole budget, are not cached.
+
+        Parameters
+        ----------
+        name : str
+        version : str or tuple
+        value : pd.DataFrame or np.ndarray
+        """
+        if version is None:
+            return
+
+        if hasattr(value, "memory_usage"):
+            size = int(value.memory_usage(index=True, deep=True).sum())
+        else:
+            size = value.nbytes
+        if size > self._max_size:
+            return
+
+        evictions = 0
+        with self._lock:
+            previous = self._entries.pop((name, version), None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[(name, version)] = (value, size)
+            self._size += size
+
+            while self._size > self._max_size:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                evictions += 1
+
+        if evictions:
+            metrics.increment(f"{self._metric}_evictions_total", evictions)
+
+    def invalidate(self, name):
+        """
+        Removes every version of a dataset from the cache.
+
+        Parameters
+        ----------
+        name : str
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == name]:
+                self._size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Removes every dataset from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class MetadataCache:
+    """
+    A cache of dataset metadata, with a time to live and a bounded number of
+    datasets (the least recently used ones are evicted).
+
+    Names of datasets that do not exist are cached too. Metadata written by
+    this service is stored in the cache right away, other changes are seen
+    once entries expire. A time to live of 0 disables the cache. Concurrent
+    loads of the same dataset are coalesced into one, cache or not.
+
+    Parameters
+    ----------
+    ttl : float
+        The time to live of entries, in seconds.
+    max_size : int
+        Max number of datasets.
+    """
+
+    def __init__(self, ttl, max_size):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight("metadata")
+
+    def get(self, name, load, cached_missing=True):
+        """
+        Reads the metadata of a dataset, from the cache or with `load`.
+
+        Parameters
+        ----------
+        name : str
+        load : callable
+            Reads the metadata from the storage, eg. `stat_dataset`.
+        cached_missing : bool
+            Whether to trust a cached "does not exist". Default to True.
+
+        Returns
+        -------
+        dict
+            A copy of the metadata, that may be modified.
+
+        Raises
+        ------
+        FileNotFoundError
+            When the dataset does not exist.
+        """
+        if self._ttl <= 0:
+            return copy.deepcopy(self._flight.do(name, load, name))
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[name]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(name)
+
+        if entry is not None and (entry[0] is not MISSING or cached_missing):
+            metrics.increment("metadata_cache_hits_total")
+            if entry[0] is MISSING:
+                raise FileNotFoundError(f"The specified dataset does not exist: {name}")
+            return copy.deepcopy(entry[0])
+
+        metrics.increment("metadata_cache_misses_total")
+        return copy.deepcopy(self._flight.do(name, self._load, name, load))
+
+    def put(self, name, metadata):
+        """
+        Stores the metadata of a dataset, eg. after it was written.
+
+        Parameters
+        ----------
+        name : str
+        metadata : dict
+        """
+        self._store(name, copy.deepcopy(metadata))
+
+    def invalidate(self, name):
+        """
+        Removes a dataset from the cache.
+
+        Parameters
+        ----------
+        name : str
+        """
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def clear(self):
+        """Removes every dataset from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, name, load):
+        """Loads the metadata of a dataset into the cache."""
+        try:
+            metadata = load(name)
+        except FileNotFoundError:
+            self._store(name, MISSING)
+            raise
+        self.put(name, metadata)
+        return metadata
+
+    def _store(self, name, value):
+        if self._ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(name, None)
+            self._entries[name] = (value, time.monotonic() + self._ttl)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+
+DATASET_CACHE = DatasetCache(DATASET_CACHE_SIZE)
+# sort permutations, by dataset version, column and order
+SORT_CACHE = DatasetCache(SORT_CACHE_SIZE, metric="sort_cache")
+METADATA_CACHE = MetadataCache(METADATA_CACHE_TTL, METADATA_CACHE_SIZE)
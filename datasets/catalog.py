@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+A local catalog of dataset metadata, so that listings and searches are
+indexed queries rather than object storage listings.
+
+The catalog is a SQLite database in WAL mode, shared by the worker processes
+of a host. It is updated on every metadata write of this service and rebuilt
+from the object storage by `reconcile_catalog`: on the first listing, in the
+background once the last rebuild is older than half of `CATALOG_TTL`, before
+the listing once it is older than `CATALOG_TTL`, and on demand with the
+command:
+
+    python -m datasets.catalog
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from os import getenv
+from os.path import join
+from tempfile import gettempdir
+
+import platiagro
+from platiagro import stat_dataset
+
+from datasets import metrics, storage
+from datasets.executors import STAT_POOL
+from datasets.singleflight import SingleFlight
+
+CATALOG_PATH = getenv("CATALOG_PATH", join(gettempdir(), "datasets-catalog.db"))
+# seconds a rebuild is fresh: datasets written or removed by other services and
+# hosts show up in listings at most that long after
+CATALOG_TTL = int(getenv("CATALOG_TTL", "300"))
+
+# sort keys of listings, by the name clients use
+SORT_KEYS = {
+    "name": "name",
+    "size": "size",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+}
+ASCENDING = "asc"
+DESCENDING = "desc"
+
+# greater than any other code point, so that name < prefix + PREFIX_END
+# matches every name that starts with prefix
+PREFIX_END = "\U0010ffff"
+
+# concurrent rebuilds of a catalog share a single one
+RECONCILES = SingleFlight("catalog")
+# rebuilds of stale catalogs, one at a time, off the requests that found them
+REFRESH_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    name TEXT PRIMARY KEY,
+    filename TEXT,
+    size INTEGER NOT NULL,
+    total INTEGER,
+    columns TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS datasets_size ON datasets (size, name);
+CREATE INDEX IF NOT EXISTS datasets_created_at ON datasets (created_at, name);
+CREATE INDEX IF NOT EXISTS datasets_updated_at ON datasets (updated_at, name);
+CREATE TABLE IF NOT EXISTS dataset_columns (
+    dataset TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    featuretype TEXT,
+    PRIMARY KEY (dataset, position)
+);
+CREATE INDEX IF NOT EXISTS dataset_columns_name ON dataset_columns (name, dataset);
+CREATE TABLE IF NOT EXISTS catalog (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT = """
+INSERT INTO datasets (name, filename, size, total, columns, created_at, updated_at)
+VALUES (:name, :filename, COALESCE(:size, 0), :total, :columns, :created_at, :updated_at)
+ON CONFLICT (name) DO UPDATE SET
+    filename = excluded.filename,
+    size = COALESCE(:size, datasets.size),
+    total = excluded.total,
+    columns = excluded.columns,
+    updated_at = MAX(excluded.updated_at, datasets.updated_at)
+"""
+
+
+class Catalog:
+    """
+    The metadata of every dataset: name, original filename, size, number of
+    rows, columns and featuretypes, and the time it was created and last
+    updated.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite database file, or ":memory:" for a catalog that lives as
+        long as the process.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._connection = None
+        self._refresh = None
+        self._lock = threading.Lock()
+
+    @property
+    def reconciled_at(self):
+        """
+        The time the catalog was last rebuilt from the object storage, by any
+        worker process of the host. None when it was never rebuilt.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM catalog WHERE key = 'reconciled_at'"
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row is not None else None
+
+    def put(self, name, metadata, updated_at=None):
+        """
+        Adds or updates a dataset.
+
+        Parameters
+        ----------
+        name : str
+        metadata : dict
+            The dataset metadata, as stored by the SDK. A missing size keeps
+            the one in the catalog.
+        updated_at : str
+            An ISO 8601 time. Default to None (now).
+        """
+        with self._lock, self._connect() as connection:
+            self._put(connection, name, metadata, updated_at or _now())
+
+    def list(self, prefix=None, column=None, sort="name", order=ASCENDING, after=None, limit=None):
+        """
+        Lists datasets, sorted by a key and then by name.
+
+        Parameters
+        ----------
+        prefix : str
+            Lists only the datasets whose name starts with it. Default to None.
+        column : str
+            Lists only the datasets that have a column with this name.
+            Default to None.
+        sort : str
+            One of `SORT_KEYS`. Default to "name".
+        order : str
+            `ASCENDING` or `DESCENDING`. Default to `ASCENDING`.
+        after : list
+            The sort key and name of the last dataset of the previous page.
+            Default to None (first page).
+        limit : int
+            Max number of datasets. Default to None (all datasets).
+
+        Returns
+        -------
+        list
+            The datasets: name, filename, size, total, columns, createdAt and
+            updatedAt.
+        """
+        key = SORT_KEYS[sort]
+        conditions, parameters = [], []
+        if prefix:
+            conditions.append("name >= ? AND name < ?")
+            parameters.extend([prefix, prefix + PREFIX_END])
+        if column is not None:
+            conditions.append("name IN (SELECT dataset FROM dataset_columns WHERE name = ?)")
+            parameters.append(column)
+        if after is not None:
+            comparison = "<" if order == DESCENDING else ">"
+            if key == "name":
+                conditions.append(f"name {comparison} ?")
+                parameters.append(after[1])
+            else:
+                conditions.append(f"({key}, name) {comparison} (?, ?)")
+                parameters.extend(after)
+
+        direction = "DESC" if order == DESCENDING else "ASC"
+        query = "SELECT name, filename, size, total, columns, created_at, updated_at FROM datasets"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {key} {direction}"
+        if key != "name":
+            query += f", name {direction}"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+
+        with self._lock:
+            rows = self._connect().execute(query, parameters).fetchall()
+        return [_to_dataset(row) for row in rows]
+
+    def reconcile(self, entries, started_at):
+        """
+        Replaces the catalog with the datasets read from the object storage,
+        in a single transaction. Datasets written by this service since the
+        storage was read are kept.
+
+        Parameters
+        ----------
+        entries : iterable
+            Tuples of dataset name, metadata and the time its content was
+            last modified.
+        started_at : str
+            The ISO 8601 time the storage started to be read.
+        """
+        with self._lock, self._connect() as connection:
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS reconciled (name TEXT PRIMARY KEY)")
+            connection.execute("DELETE FROM reconciled")
+            for name, metadata, last_modified in entries:
+                self._put(connection, name, metadata, last_modified)
+                connection.execute("INSERT OR IGNORE INTO reconciled (name) VALUES (?)", (name,))
+
+            stale = "SELECT name FROM datasets WHERE updated_at < ? AND name NOT IN reconciled"
+            connection.execute(f"DELETE FROM dataset_columns WHERE dataset IN ({stale})", (started_at,))
+            connection.execute(f"DELETE FROM datasets WHERE name IN ({stale})", (started_at,))
+            connection.execute(
+                "INSERT OR REPLACE INTO catalog (key, value) VALUES ('reconciled_at', ?)",
+                (started_at,),
+            )
+
+    def _put(self, connection, name, metadata, updated_at):
+        columns = metadata.get("columns")
+        featuretypes = metadata.get("featuretypes") or [None] * len(columns or [])
+        connection.execute(
+            UPSERT,
+            {
+                "name": name,
+                "filename": metadata.get("original-filename"),
+                "size": metadata.get("size"),
+                "total": metadata.get("total"),
+                "columns": json.dumps(list(zip(columns, featuretypes))) if columns else None,
+                "created_at": updated_at,
+                "updated_at": updated_at,
+            },
+        )
+        connection.execute("DELETE FROM dataset_columns WHERE dataset = ?", (name,))
+        if columns:
+            connection.executemany(
+                "INSERT INTO dataset_columns (dataset, position, name, featuretype) VALUES (?, ?, ?, ?)",
+                [(name, position, col, ftype) for position, (col, ftype) in enumerate(zip(columns, featuretypes))],
+            )
+
+    def _connect(self):
+        if self._connection is None:
+            # one connection per process, its use is serialized by the lock;
+            # the worker processes of a host share the database through WAL
+            connection = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+
+def record_dataset(name, metadata):
+    """
+    Records the metadata of a dataset that was just written in the catalog.
+    Failures are logged, not raised: the object storage holds the metadata and
+    the next reconcile fixes the catalog.
+
+    Parameters
+    ----------
+    name : str
+    metadata : dict
+    """
+    try:
+        CATALOG.put(name, metadata)
+    except sqlite3.Error:
+        logging.exception(f"Could not record dataset {name} in the catalog")
+        metrics.increment("catalog_write_failures_total")
+
+
+def reconcile_catalog(catalog=None):
+    """
+    Rebuilds the catalog from the object storage: lists the datasets, then
+    reads their metadata concurrently. Concurrent calls share a single
+    rebuild.
+
+    Parameters
+    ----------
+    catalog : Catalog
+        Default to None (`CATALOG`).
+
+    Returns
+    -------
+    int
+        Number of datasets in the catalog.
+    """
+    catalog = catalog or CATALOG
+    return RECONCILES.do(catalog, _reconcile, catalog)
+
+
+def refresh_catalog(catalog=None):
+    """
+    Makes sure the catalog is built and fresh. A catalog that was never built
+    is rebuilt right away. One whose last rebuild is older than half of
+    `CATALOG_TTL` is rebuilt in the background, and is served as is in the
+    meantime. One older than `CATALOG_TTL` is only served once rebuilt, so
+    that listings are never older than that, whatever the time since the
+    previous one.
+
+    Parameters
+    ----------
+    catalog : Catalog
+        Default to None (`CATALOG`).
+
+    Returns
+    -------
+    concurrent.futures.Future
+        The rebuild, or None when the catalog is fresh.
+    """
+    catalog = catalog or CATALOG
+    reconciled_at = catalog.reconciled_at
+    if reconciled_at is None:
+        reconcile_catalog(catalog)
+        return None
+
+    age = (datetime.now(timezone.utc) - reconciled_at).total_seconds()
+    if age < CATALOG_TTL / 2:
+        return None
+
+    with catalog._lock:
+        if catalog._refresh is None or catalog._refresh.done():
+            catalog._refresh = REFRESH_POOL.submit(_refresh, catalog)
+        refresh = catalog._refresh
+
+    if age >= CATALOG_TTL:
+        # waits for the rebuild, a failed one leaves the catalog as is
+        refresh.result()
+    return refresh
+
+
+def _refresh(catalog):
+    try:
+        reconcile_catalog(catalog)
+    except Exception:
+        # the catalog stays as is, the next listing tries again
+        logging.exception("Could not rebuild the catalog")
+        metrics.increment("catalog_reconcile_failures_total")
+
+
+def _reconcile(catalog):
+    started_at = _now()
+    names = platiagro.list_datasets()
+    objects = storage.list_dataset_objects()
+
+    def read(name):
+        try:
+            metadata = stat_dataset(name)
+        except FileNotFoundError:
+            return None
+        stored = objects.get(name, {})
+        metadata.setdefault("size", stored.get("size"))
+        return name, metadata, stored.get("lastModified") or started_at
+
+    with metrics.timer("catalog_reconcile"):
+        entries = [entry for entry in STAT_POOL.map(read, names) if entry is not None]
+        catalog.reconcile(entries, started_at)
+    return len(entries)
+
+
+def _to_dataset(row):
+    name, filename, size, total, columns, created_at, updated_at = row
+    dataset = {
+        "name": name,
+        "filename": filename,
+        "size": size,
+        "createdAt": created_at,
+        "updatedAt": updated_at,
+    }
+    if total is not None:
+        dataset["total"] = total
+    if columns is not None:
+        dataset["columns"] = [
+            {"name": col, "featuretype": ftype} for col, ftype in json.loads(columns)
+        ]
+    return dataset
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+CATALOG = Catalog(CATALOG_PATH)
+
+
+def parse_args(args):
+    """Takes argv and parses catalog options."""
+    parser = argparse.ArgumentParser(
+        description="Rebuilds the datasets catalog from the object storage",
+    )
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=CATALOG_PATH,
+        help=f"The catalog database (default: {CATALOG_PATH})",
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    total = reconcile_catalog(Catalog(args.path))
+    print(f"{total} datasets in the catalog")
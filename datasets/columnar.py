@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Columnar (Parquet) copies of datasets, written at ingest."""
+import csv
+import logging
+from os import SEEK_SET, getenv
+from tempfile import SpooledTemporaryFile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from datasets import storage
+from datasets.cache import DATASET_CACHE
+from datasets.dialect import open_decompressed
+from datasets.readers import page_bounds
+
+COLUMNAR_EXTENSION = "parquet"
+COLUMNAR_FORMAT = "parquet"
+ROW_GROUP_SIZE = int(getenv("PARQUET_ROW_GROUP_SIZE", "65536"))
+BLOCK_SIZE = 1024 * 1024  # 1MB
+# a format no value matches, so that pyarrow does not infer timestamps
+NO_TIMESTAMPS = ["%Y-%m-%dT%H:%M:%S.%f%z~"]
+SPOOLED_MAX_SIZE = 16 * 1024 * 1024  # 16MB
+
+
+def columnar_object_name(name):
+    """
+    The object where the columnar copy of a dataset is stored.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+
+    Returns
+    -------
+    str
+    """
+    return storage.sidecar_object_name(name, COLUMNAR_EXTENSION)
+
+
+def write_columnar(name, file, columns, dialect):
+    """
+    Converts an uploaded CSV file to Parquet with pyarrow's streaming CSV
+    reader, in row groups of up to `ROW_GROUP_SIZE` rows, and stores it next
+    to the dataset.
+
+    The conversion is given up (and the dataset is read from its CSV) when
+    the file can't be parsed, or when a block does not fit the column types
+    inferred from the first one, eg. a column of integers that has a text
+    value further down the file.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    file : IO
+        The uploaded file.
+    columns : list
+        The column names.
+    dialect : dict
+        The CSV dialect: sep, quotechar, header, encoding and compression.
+
+    Returns
+    -------
+    dict
+        The columnar copy details, or None when it was not written.
+    """
+    read_options = pcsv.ReadOptions(
+        column_names=columns,
+        skip_rows=1 if dialect["header"] else 0,
+        encoding=dialect["encoding"] or "utf8",
+        block_size=BLOCK_SIZE,
+    )
+    parse_options = pcsv.ParseOptions(
+        delimiter=dialect["sep"],
+        quote_char=dialect["quotechar"],
+        newlines_in_values=True,
+    )
+    # like pandas, empty fields are missing values and texts are not
+    # converted to timestamps
+    convert_options = pcsv.ConvertOptions(
+        strings_can_be_null=True,
+        timestamp_parsers=NO_TIMESTAMPS,
+    )
+
+    file.seek(0, SEEK_SET)
+    rows = 0
+    with SpooledTemporaryFile(max_size=SPOOLED_MAX_SIZE) as parquet:
+        try:
+            with open_decompressed(file, dialect["compression"]) as stream:
+                reader = pcsv.open_csv(
+                    stream,
+                    read_options=read_options,
+                    parse_options=parse_options,
+                    convert_options=convert_options,
+                )
+                with pq.ParquetWriter(parquet, _writer_schema(reader.schema)) as writer:
+                    batches = []
+                    for batch in reader:
+                        batches.append(batch)
+                        rows += batch.num_rows
+                        if sum(b.num_rows for b in batches) >= ROW_GROUP_SIZE:
+                            _write_row_groups(writer, batches)
+                            batches = []
+                    _write_row_groups(writer, batches)
+        except (pa.ArrowException, csv.Error, UnicodeDecodeError) as e:
+            logging.warning("Columnar copy of %s was not written: %s", name, e)
+            return None
+
+        length = parquet.tell()
+        parquet.seek(0, SEEK_SET)
+        storage.put_file(columnar_object_name(name), parquet, length)
+
+    return {
+        "format": COLUMNAR_FORMAT,
+        "size": length,
+        "rows": rows,
+    }
+
+
+def _writer_schema(schema):
+    """Empty columns are read as floats by pandas, rather than as nulls."""
+    return pa.schema(
+        [
+            field.with_type(pa.float64()) if pa.types.is_null(field.type) else field
+            for field in schema
+        ]
+    )
+
+
+def _write_row_groups(writer, batches):
+    """Writes record batches as row groups of up to `ROW_GROUP_SIZE` rows."""
+    if batches:
+        table = pa.Table.from_batches(batches).cast(writer.schema)
+        writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+
+
+def load_columnar(name, metadata, columns=None):
+    """
+    Reads the whole columnar copy of a dataset. When only some columns are
+    read, only their chunks are fetched.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    columns : list
+        The columns to read. Default to None (all columns).
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    if columns is None:
+        data = storage.get_bytes(columnar_object_name(name))
+        return pq.read_table(pa.BufferReader(data)).to_pandas()
+
+    source = storage.RangeReader(columnar_object_name(name), metadata["columnar"]["size"])
+    parquet = pq.ParquetFile(source, pre_buffer=True)
+    return parquet.read(columns=columns).to_pandas()[columns]
+
+
+def iter_columnar(name, metadata, batch_size, columns=None):
+    """
+    Reads the columnar copy of a dataset in batches of rows, fetching its row
+    groups one at a time, and only the chunks of the given columns.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    batch_size : int
+        Max number of rows per batch.
+    columns : list
+        The columns to read. Default to None (all columns).
+
+    Yields
+    ------
+    pd.DataFrame
+    """
+    source = storage.RangeReader(columnar_object_name(name), metadata["columnar"]["size"])
+    parquet = pq.ParquetFile(source)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+        df = batch.to_pandas()
+        yield df if columns is None else df[columns]
+
+
+def read_columnar_page(name, metadata, page, page_size, columns=None, version=None):
+    """
+    Reads a page of the columnar copy of a dataset. Only the Parquet footer
+    and the chunks of the given columns in the row groups that overlap the
+    page are fetched.
+
+    Decoded row groups are kept in the cache of parsed datasets, so that the
+    following pages of a row group are served from memory.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    page : int
+        The page number. First page is 1.
+    page_size : int
+    columns : list
+        The columns to read. Default to None (all columns).
+    version : str
+        The dataset version, as returned by `dataset_version`. Default to
+        None (nothing is cached).
+
+    Returns
+    -------
+    pd.DataFrame
+        The page rows.
+
+    Raises
+    ------
+    NotFound
+        When the dataset does not contain the requested page.
+    """
+    start, end = page_bounds(page, page_size, metadata["columnar"]["rows"])
+
+    parquet = None
+    key = None if version is None else (version, "row-groups")
+    starts = DATASET_CACHE.get(name, key)
+    if starts is None:
+        parquet = _open_columnar(name, metadata)
+        num_rows = [parquet.metadata.row_group(index).num_rows for index in range(parquet.num_row_groups)]
+        # the first row of each row group, and the number of rows
+        starts = np.cumsum([0] + num_rows)
+        DATASET_CACHE.put(name, key, starts)
+
+    first = int(np.searchsorted(starts, start, side="right")) - 1
+    last = int(np.searchsorted(starts, end, side="left"))
+
+    frames = []
+    for index in range(first, last):
+        frame = _cached_row_group(name, version, index, columns)
+        if frame is None:
+            parquet = parquet or _open_columnar(name, metadata)
+            frame = parquet.read_row_group(index, columns=columns).to_pandas()
+            projection = None if columns is None else tuple(columns)
+            DATASET_CACHE.put(name, None if version is None else (version, "row-group", index, projection), frame)
+        frames.append(frame if columns is None else frame[columns])
+
+    df = pd.concat(frames, ignore_index=True)
+    offset = int(starts[first])
+    return df.iloc[start - offset:end - offset].reset_index(drop=True)
+
+
+def _open_columnar(name, metadata):
+    source = storage.RangeReader(columnar_object_name(name), metadata["columnar"]["size"])
+    # coalesces the column chunks of the row groups into few range requests
+    return pq.ParquetFile(source, pre_buffer=True)
+
+
+def _cached_row_group(name, version, index, columns):
+    """A decoded row group from the cache, whole or with only the given columns."""
+    if version is None:
+        return None
+    frame = DATASET_CACHE.get(name, (version, "row-group", index, None))
+    if frame is None and columns is not None:
+        frame = DATASET_CACHE.get(name, (version, "row-group", index, tuple(columns)))
+    return frame
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-from platiagro import load_dataset, save_dataset, stat_dataset
+from platiagro import stat_dataset, update_dataset_metadata
 from platiagro.featuretypes import validate_featuretypes
+from datasets.cache import DATASET_CACHE, METADATA_CACHE
+from datasets.catalog import record_dataset
 from datasets.exceptions import BadRequest, NotFound
 
 COLUMN_NOT_FOUND = NotFound("ColumnNotFound", "The specified column does not exist")
@@ -27,7 +29,7 @@ def list_columns(dataset):
         When the dataset does not exist.
     """
     try:
-        metadata = stat_dataset(dataset)
+        metadata = METADATA_CACHE.get(dataset, stat_dataset)
 
         columns = metadata.get("columns", [])
         featuretypes = metadata.get("featuretypes", [])
@@ -40,7 +42,8 @@ def list_columns(dataset):
 
 def update_column(dataset, column, featuretype):
     """
-    Updates a column from a dataset.
+    Updates a column from a dataset. Only the dataset metadata is written,
+    whatever the dataset size.
 
     Paramters
     ---------
@@ -64,30 +67,68 @@ def update_column(dataset, column, featuretype):
     BadRequest
         When the featuretype is invalid.
     """
+    update_columns(dataset, {column: featuretype})
+    return {"name": column, "featuretype": featuretype}
+
+
+def update_columns(dataset, featuretypes):
+    """
+    Updates the featuretypes of several columns from a dataset, with a single
+    validation and a single metadata write.
+
+    Parameters
+    ----------
+    dataset : str
+        The dataset name.
+    featuretypes : dict
+        The new feature types (Numerical, Categorical, or DateTime), by
+        column name.
+
+    Returns
+    -------
+    list
+        A list of columns names and featuretypes.
+
+    Raises
+    ------
+    NotFound
+        When the dataset or any column does not exist.
+
+    BadRequest
+        When a featuretype is invalid.
+    """
+    if not isinstance(featuretypes, dict):
+        raise BadRequest("ValueError", "featuretypes must map column names to featuretypes")
+
     try:
-        metadata = stat_dataset(dataset)
+        metadata = METADATA_CACHE.get(dataset, stat_dataset)
 
         if "columns" not in metadata or "featuretypes" not in metadata:
             raise COLUMN_NOT_FOUND
 
         columns = metadata["columns"]
+        positions = {column: index for index, column in enumerate(columns)}
 
-        if column not in columns:
+        if any(column not in positions for column in featuretypes):
             raise COLUMN_NOT_FOUND
 
         # sets new metadata
-        index = columns.index(column)
-        metadata["featuretypes"][index] = featuretype
-
-        validate_featuretypes(metadata["featuretypes"])
-
-        df = load_dataset(dataset)
-
-        # uses PlatIAgro SDK to save the dataset
-        save_dataset(dataset, df, metadata=metadata)
+        updated = list(metadata["featuretypes"])
+        for column, featuretype in featuretypes.items():
+            updated[positions[column]] = featuretype
+
+        validate_featuretypes(updated)
+
+        # featuretypes are metadata only: the data object, its row index and
+        # its columnar copy are left untouched
+        metadata["featuretypes"] = updated
+        update_dataset_metadata(name=dataset, metadata=metadata)
+        METADATA_CACHE.put(dataset, metadata)
+        record_dataset(dataset, metadata)
+        DATASET_CACHE.invalidate(dataset)
     except FileNotFoundError:
         raise DATASET_NOT_FOUND
     except ValueError as e:
         raise BadRequest("ValueError", str(e))
 
-    return {"name": column, "featuretype": featuretype}
+    return [{"name": col, "featuretype": ftype} for col, ftype in zip(columns, updated)]
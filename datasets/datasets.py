@@ -1,18 +1,19 @@
 # -*- coding: utf-8 -*-
+import fcntl
+import hashlib
 import json
-from io import TextIOWrapper
-from os import SEEK_SET
-from os.path import splitext
-import shutil
-from tempfile import SpooledTemporaryFile, NamedTemporaryFile
+import zipfile
+from base64 import b64decode, urlsafe_b64encode
+from contextlib import contextmanager
+from os import SEEK_SET, getenv
+from os.path import join, splitext
+from tempfile import SpooledTemporaryFile, gettempdir
 from unicodedata import normalize
 from uuid import uuid4
 
-import numpy as np
 import pandas as pd
 import csv
 import platiagro
-from chardet.universaldetector import UniversalDetector
 from fastapi.responses import StreamingResponse
 from googleapiclient.discovery import build
 from googleapiclient.http import HttpError, MediaIoBaseDownload
@@ -21,31 +22,138 @@ from pandas.io.common import infer_compression
 from platiagro import load_dataset, save_dataset, stat_dataset, update_dataset_metadata
 from platiagro.featuretypes import infer_featuretypes, validate_featuretypes
 
-from datasets import monkeypatch  # noqa: F401
+from datasets import metrics, monkeypatch, storage  # noqa: F401
+from datasets.cache import DATASET_CACHE, METADATA_CACHE, SORT_CACHE
+from datasets.catalog import ASCENDING, CATALOG, DESCENDING, SORT_KEYS, record_dataset, refresh_catalog
+from datasets.columnar import iter_columnar, load_columnar, read_columnar_page, write_columnar
+from datasets.dialect import detect_dialect, detect_encoding, read_csv
 from datasets.exceptions import BadRequest, NotFound
-from datasets.utils import data_pagination
+from datasets.filters import Filter
+from datasets.ingest import (
+    INGEST_CHUNK_SIZE,
+    IngestReader,
+    RowCounter,
+    count_zip_records,
+)
+from datasets.jobs import submit_job
+from datasets.readers import (
+    ROW_INDEX_STRIDE,
+    build_index,
+    iter_csv,
+    load_csv,
+    page_bounds,
+    read_page,
+    save_index,
+)
+from datasets.sampling import sample_rows
+from datasets.serializers import JSON_MEDIA_TYPE, stream_dataset
+from datasets.singleflight import SingleFlight
+from datasets.sorting import sort_permutation
 
 NOT_FOUND = NotFound("DatasetNotFound", "The specified dataset does not exist")
 SPOOLED_MAX_SIZE = 1024 * 1024  # 1MB
 CHUNK_SIZE = 1024
 MINIMAL_CHUNK_SIZE_TO_FIND_FILE_TYPE = 5 * 1024  # bytes
 VALUE_ERROR_MESSAGE = "Invalid parameters"
+PREVIEW_PAGE_SIZE = 10
+RESERVATION_EXTENSION = "reservation"
+NAMES_LOCK_PATH = getenv("NAMES_LOCK_PATH", join(gettempdir(), "datasets-names.lock"))
+STREAM_BATCH_SIZE = 10000  # rows
 
+# concurrent requests for a dataset that is not in cache share a single load
+DATASET_LOADS = SingleFlight("datasets")
+# concurrent sorts of a dataset by the same column share a single sort
+SORTS = SingleFlight("sorts")
 
-def list_datasets():
+
+def list_datasets(
+    prefix=None, limit=None, token=None, include=None, column=None, sort="name", order=ASCENDING
+):
     """
-    Lists all datasets from our object storage.
+    Lists datasets from the catalog.
+
+    Parameters
+    ----------
+    prefix : str
+        Lists only the datasets whose name starts with it. Default to None.
+    limit : int
+        Max number of datasets. Default to None (all datasets).
+    token : str
+        The continuation token returned with the previous page. Default to
+        None (first page).
+    include : str
+        "metadata" adds the filename, size, total, columns and times of
+        each dataset. Default to None.
+    column : str
+        Lists only the datasets that have a column with this name. Default
+        to None.
+    sort : str
+        name, size, createdAt or updatedAt. Default to "name".
+    order : str
+        asc or desc. Default to "asc".
 
     Returns
     -------
-    List[Dict[str, Any]]
-        A list of all datasets.
+    tuple
+        The datasets (List[Dict[str, Any]]) and the continuation token of
+        the next page, None on the last page.
+
+    Raises
+    ------
+    BadRequest
+        When a parameter is invalid.
     """
-    datasets = platiagro.list_datasets()
-    return [{"name": name} for name in datasets]
+    if limit is not None and limit < 1:
+        raise BadRequest("InvalidLimit", "limit must be a positive integer")
+    if include not in (None, "", "metadata"):
+        raise BadRequest("InvalidInclude", "include must be metadata")
+    if sort not in SORT_KEYS:
+        raise BadRequest("InvalidSort", f"sort must be one of {', '.join(SORT_KEYS)}")
+    if order not in (ASCENDING, DESCENDING):
+        raise BadRequest("InvalidOrder", "order must be asc or desc")
+
+    after = decode_token(token) if token else None
+
+    # the catalog is kept up to date by every write, and rebuilt from the
+    # object storage for the datasets written or removed elsewhere
+    refresh_catalog(CATALOG)
+
+    datasets = CATALOG.list(
+        prefix=prefix,
+        column=column,
+        sort=sort,
+        order=order,
+        after=after,
+        limit=limit + 1 if limit is not None else None,
+    )
 
+    next_token = None
+    if limit is not None and len(datasets) > limit:
+        datasets = datasets[:limit]
+        next_token = encode_token([datasets[-1][sort], datasets[-1]["name"]])
 
-def create_dataset(file_object):
+    if include != "metadata":
+        datasets = [{"name": dataset["name"]} for dataset in datasets]
+    return datasets, next_token
+
+
+def encode_token(position):
+    """Encodes the sort key and name of the last dataset of a page as a continuation token."""
+    return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_token(token):
+    """Decodes a continuation token into the sort key and name of the last dataset of a page."""
+    try:
+        position = json.loads(b64decode(token.encode(), altchars=b"-_", validate=True))
+    except (ValueError, UnicodeError):
+        position = None
+    if not isinstance(position, list) or len(position) != 2:
+        raise BadRequest("InvalidToken", "The continuation token is invalid")
+    return position
+
+
+def create_dataset(file_object, name=None):
     """
     Creates a new dataset in our object storage.
 
@@ -53,12 +161,74 @@ def create_dataset(file_object):
     ----------
     file_object : dict or fastapi.File
         file objects.
+    name : str
+        A name reserved by `generate_name`, so that retries store the dataset
+        under the same name. Default to None (a new name).
 
     Returns
     -------
     dict
         The dataset details: name, columns, and filename.
 
+    Raises
+    -------
+    BadRequest
+        When incoming files are missing or valid.
+    """
+    upload = store_dataset(file_object, name=name)
+    return ingest_dataset(upload)
+
+
+def create_dataset_job(file_object, name=None):
+    """
+    Stores a new dataset in our object storage and schedules its parsing and
+    featuretype inference to run in background.
+
+    Parameters
+    ----------
+    file_object : fastapi.File
+        file objects.
+    name : str
+        A name reserved by `generate_name`, so that retries store the dataset
+        under the same name. Default to None (a new name).
+
+    Returns
+    -------
+    dict
+        The ingest job details.
+
+    Raises
+    -------
+    BadRequest
+        When incoming files are missing or valid.
+    """
+    upload = store_dataset(file_object, name=name)
+    return submit_job(upload["name"], _ingest_and_close, upload)
+
+
+def store_dataset(file_object, name=None):
+    """
+    Streams an uploaded file to our object storage, under a new dataset name.
+
+    The file is read from its start, so that a failed attempt may be retried
+    with the same file object.
+
+    Parameters
+    ----------
+    file_object : dict or fastapi.File
+        file objects.
+    name : str
+        A name reserved by `generate_name`. Its reservation is released once
+        the dataset is stored, and kept when storing fails, so that a retry
+        gets the same name. Default to None (a new name, released either way).
+
+    Returns
+    -------
+    dict
+        The upload details: dataset name, the uploaded file, the initial
+        metadata, the compression and the row counter (None when records
+        could not be counted while streaming).
+
     Raises
     -------
     BadRequest
@@ -71,57 +241,278 @@ def create_dataset(file_object):
         file = file_object.file
         filename = file_object.filename
 
-    file.seek(0, SEEK_SET)
-    with NamedTemporaryFile() as buffer:
-        shutil.copyfileobj(file, buffer)
-
-        # if user does not select file, the browser also
-        # submits an empty part without filename
-        if filename == "":
-            raise BadRequest("NoFile", "No selected file.")
+    # if user does not select file, the browser also
+    # submits an empty part without filename
+    if filename == "":
+        raise BadRequest("NoFile", "No selected file.")
 
-        # generate a dataset name from filename
+    # generate a dataset name from filename
+    reserved = name is not None
+    if not reserved:
         name = generate_name(filename)
 
-        try:
-            # reads file into a DataFrame
-            df = read_into_dataframe(buffer, filename)
-        except UnicodeDecodeError:
-            # if read fails, then uploads raw file
-            buffer.seek(0, SEEK_SET)
-            save_dataset(name, buffer, metadata={"original-filename": filename})
-            return {"name": name, "filename": filename}
-
-        columns = df.columns.values.tolist()
-        featuretypes = infer_featuretypes(df)
-
-        metadata = {
+    # streams the upload to our object storage, computing its size, checksum
+    # and number of records from the very same bytes that are written
+    digest = hashlib.sha256()
+    consumers = [digest]
+
+    compression = infer_compression(filename, "infer")
+    counter = None
+    if RowCounter.supports(compression):
+        counter = RowCounter(compression, index_stride=ROW_INDEX_STRIDE)
+    if counter is not None:
+        consumers.append(counter)
+
+    # rewinds the file, and counts and hashes it from scratch
+    reader = IngestReader(file, consumers=consumers)
+    try:
+        with metrics.timer("ingest_stage", stage="store"):
+            save_dataset(name, reader, metadata={"original-filename": filename})
+            reader.finish()
+    except Exception:
+        if not reserved:
+            release_name(name)
+        raise
+    # the stored dataset now holds its name
+    release_name(name)
+    METADATA_CACHE.put(name, {"original-filename": filename})
+
+    metadata = {
+        "original-filename": filename,
+        "size": reader.size,
+        "sha256": digest.hexdigest(),
+    }
+    record_dataset(name, metadata)
+    return {
+        "name": name,
+        "file": file,
+        "metadata": metadata,
+        "compression": compression,
+        "counter": counter,
+    }
+
+
+def ingest_dataset(upload):
+    """
+    Parses a stored dataset, infers its featuretypes and updates its metadata.
+
+    Parameters
+    ----------
+    upload : dict
+        The upload details returned by `store_dataset`.
+
+    Returns
+    -------
+    dict
+        The dataset details: name, columns, and filename.
+    """
+    name, file, metadata = upload["name"], upload["file"], upload["metadata"]
+    filename = metadata["original-filename"]
+
+    try:
+        # reads file into a DataFrame
+        file.seek(0, SEEK_SET)
+        df = read_into_dataframe(file, filename)
+    except (UnicodeDecodeError, csv.Error, pd.errors.ParserError, pd.errors.EmptyDataError):
+        # if read fails, then keeps the raw file
+        update_dataset_metadata(name=name, metadata=metadata)
+        METADATA_CACHE.put(name, metadata)
+        record_dataset(name, metadata)
+        return {"name": name, "filename": filename}
+
+    columns = df.columns.values.tolist()
+    dialect = df.attrs["dialect"]
+
+    with metrics.timer("ingest_stage", stage="featuretypes"):
+        # a sample of the whole file, so that sorted files are not misclassified
+        # from their first rows only
+        sample = sample_rows(file, dialect=dialect, columns=columns)
+        featuretypes = infer_featuretypes(sample if sample is not None else df)
+
+    with metrics.timer("ingest_stage", stage="columnar"):
+        columnar = write_columnar(name, file, columns=columns, dialect=dialect)
+    if columnar is not None:
+        metadata["columnar"] = columnar
+
+    metadata.update(
+        {
             "columns": columns,
             "featuretypes": featuretypes,
-            "original-filename": filename,
-            "total": len(df.index),
+            "total": count_rows(upload, dialect=dialect, preview=df, sample=sample, columnar=columnar),
         }
-        buffer.seek(0, SEEK_SET)
-        save_dataset(name, buffer, metadata=metadata)
+    )
+
+    # the way the file was parsed, so that reads do not need to detect it again
+    metadata["dialect"] = dialect
+    if sample is not None:
+        metadata["dtypes"] = sample.attrs["dtypes"]
+
+    with metrics.timer("ingest_stage", stage="index"):
+        index = index_rows(upload, dialect=dialect, sample=sample)
+        if index is not None:
+            save_index(name, index)
+            metadata["index"] = {"stride": index["stride"]}
+
+    with metrics.timer("ingest_stage", stage="metadata"):
+        update_dataset_metadata(name=name, metadata=metadata)
+    METADATA_CACHE.put(name, metadata)
+    record_dataset(name, metadata)
 
     columns = [
         {"name": col, "featuretype": ftype} for col, ftype in zip(columns, featuretypes)
     ]
 
-    # Replaces NaN value by a text "NaN" so JSON encode doesn't fail
-    df.replace(np.nan, "NaN", inplace=True, regex=True)
-    df.replace(np.inf, "Inf", inplace=True, regex=True)
-    df.replace(-np.inf, "-Inf", inplace=True, regex=True)
-    data = df.values.tolist()
     return {
         "name": name,
         "columns": columns,
-        "data": data,
-        "total": len(df.index),
+        "data": df,
+        "total": metadata["total"],
         "filename": filename,
     }
 
 
+def count_rows(upload, dialect, preview, sample=None, columnar=None):
+    """
+    Counts the data rows of an uploaded CSV file.
+
+    The count of a parse of the whole file is used when there is one: the
+    sampling pass or the columnar copy. Otherwise the records counted while
+    the file was stored, and only then the rows of the preview.
+
+    Parameters
+    ----------
+    upload : dict
+        The upload details returned by `store_dataset`.
+    dialect : dict
+        The CSV dialect: sep, quotechar, header, encoding and compression.
+    preview : pd.DataFrame
+        The rows parsed from the head of the file.
+    sample : pd.DataFrame
+        The sample returned by `sample_rows`. Default to None.
+    columnar : dict
+        The columnar copy details returned by `write_columnar`. Default to
+        None.
+
+    Returns
+    -------
+    int
+    """
+    if sample is not None:
+        return sample.attrs["rows"]
+    if columnar is not None:
+        return columnar["rows"]
+
+    counter = dialect_counter(upload, dialect=dialect)
+    records = counter.records if counter is not None else None
+    if records is None and upload["compression"] == "zip" and _countable(dialect):
+        upload["file"].seek(0, SEEK_SET)
+        try:
+            records = count_zip_records(upload["file"], quotechar=dialect["quotechar"])
+        except (ValueError, zipfile.BadZipFile):
+            records = None
+
+    if records is None:
+        return len(preview.index)
+
+    return records - 1 if dialect["header"] else records
+
+
+def dialect_counter(upload, dialect):
+    """
+    The row counter of an uploaded CSV file, for the quote character of its
+    dialect.
+
+    Uploads are counted while they are stored, before their dialect is known,
+    with the default quote character: files quoted with another character are
+    counted again from the uploaded file. Files in UTF-16 or UTF-32, whose
+    line breaks are not single bytes, are not counted.
+
+    Parameters
+    ----------
+    upload : dict
+        The upload details returned by `store_dataset`.
+    dialect : dict
+        The CSV dialect: sep, quotechar, header, encoding and compression.
+
+    Returns
+    -------
+    RowCounter
+        The counter, or None when the file can't be counted.
+    """
+    counter = upload["counter"]
+    if not _countable(dialect):
+        return None
+    if counter is None or counter.quotechar == dialect["quotechar"]:
+        return counter
+
+    try:
+        counter = RowCounter(
+            upload["compression"],
+            quotechar=dialect["quotechar"],
+            index_stride=counter.stride,
+        )
+    except ValueError:
+        counter = None
+    else:
+        file = upload["file"]
+        file.seek(0, SEEK_SET)
+        for chunk in iter(lambda: file.read(INGEST_CHUNK_SIZE), b""):
+            counter.update(chunk)
+        file.seek(0, SEEK_SET)
+
+    upload["counter"] = counter
+    return counter
+
+
+def _countable(dialect):
+    """Whether the line breaks of a file are single bytes, that counters look for."""
+    encoding = (dialect["encoding"] or "utf-8").lower().replace("_", "-")
+    return not encoding.startswith(("utf-16", "utf-32"))
+
+
+def index_rows(upload, dialect, sample):
+    """
+    Builds the row index of an uploaded CSV file, that allows to read any
+    page of it with a single byte range read.
+
+    The offsets are trusted only when the records counted while the file was
+    stored are the rows of a parse of the whole file: a stray quote, for
+    instance, makes the counter skip line breaks.
+
+    Parameters
+    ----------
+    upload : dict
+        The upload details returned by `store_dataset`.
+    dialect : dict
+        The CSV dialect: sep, quotechar, header, encoding and compression.
+    sample : pd.DataFrame
+        The sample returned by `sample_rows`, that holds the number of rows
+        of the whole file.
+
+    Returns
+    -------
+    dict
+        The index, or None when the file can't be indexed (eg. compressed).
+    """
+    counter = dialect_counter(upload, dialect=dialect)
+    if counter is None or counter.records is None or counter.offsets is None:
+        return None
+
+    header = 1 if dialect["header"] else 0
+    if sample is None or counter.records - header != sample.attrs["rows"]:
+        return None
+
+    return build_index(counter, dialect=dialect)
+
+
+def _ingest_and_close(upload):
+    """Runs an ingest job and releases the uploaded file."""
+    try:
+        ingest_dataset(upload)
+    finally:
+        upload["file"].close()
+
+
 def create_google_drive_dataset(gfile):
     """
     Download the google drive file and creates a new dataset in our object storage.
@@ -188,7 +579,16 @@ def create_google_drive_dataset(gfile):
         raise BadRequest("HttpError", reason)
 
 
-def get_dataset(name, page=1, page_size=10):
+def get_dataset(
+    name,
+    page=1,
+    page_size=10,
+    media_type=JSON_MEDIA_TYPE,
+    columns=None,
+    expression=None,
+    sort=None,
+    order=ASCENDING,
+):
     """
     Details a dataset from our object storage.
 
@@ -199,12 +599,26 @@ def get_dataset(name, page=1, page_size=10):
     page : int or str
         The page number. First page is 1. Default to 1.
     page_size : int or str
-        The page size. Default value is 10.
+        The page size. Default value is 10. -1 streams all rows.
+    media_type : str
+        The media type of streamed rows: JSON or NDJSON. Default to JSON.
+    columns : list
+        The names of the columns to return, in order. Only these columns
+        are read. Default to None (all columns).
+    expression : str
+        A filter of the rows, see `datasets.filters`. Pages and total then
+        count the matching rows only. Default to None (all rows).
+    sort : str
+        The column to sort the rows by. Default to None (file order).
+    order : str
+        asc or desc. Default to "asc".
 
     Returns
     -------
-    dict
-        The dataset details: name, columns, and filename.
+    dict or StreamingResponse
+        The dataset details: name, columns, and filename. The page rows in
+        data are a DataFrame, encoded by `DatasetResponse`. All rows are
+        streamed in batches instead.
 
     Raises
     ------
@@ -214,30 +628,57 @@ def get_dataset(name, page=1, page_size=10):
     """
     try:
         page, page_size = int(page), int(page_size)
-        metadata = stat_dataset(name)
+        metadata = METADATA_CACHE.get(name, stat_dataset)
         filename = metadata.get("original-filename")
         dataset = {"name": name, "filename": filename}
 
         if "columns" in metadata and "featuretypes" in metadata:
-            columns = metadata["columns"]
-            featuretypes = metadata["featuretypes"]
-            columns = [
-                {"name": col, "featuretype": ftype}
-                for col, ftype in zip(columns, featuretypes)
+            featuretypes = dict(zip(metadata["columns"], metadata["featuretypes"]))
+            columns = select_columns(metadata["columns"], columns)
+            dataset["columns"] = [
+                {"name": col, "featuretype": featuretypes[col]}
+                for col in columns or metadata["columns"]
             ]
-            content = load_dataset(name)
-            # Replaces NaN value by a text "NaN" so JSON encode doesn't fail
-            content.replace(np.nan, "NaN", inplace=True, regex=True)
-            content.replace(np.inf, "Inf", inplace=True, regex=True)
-            content.replace(-np.inf, "-Inf", inplace=True, regex=True)
-            data = content.values.tolist()
-
-            if page_size != -1:
-                data = data_pagination(content=data, page=page, page_size=page_size)
-
-            dataset.update(
-                {"columns": columns, "data": data, "total": len(content.index)}
-            )
+
+            row_filter = None
+            if expression:
+                row_filter = Filter(expression, metadata["columns"], metadata["featuretypes"])
+
+            if sort is not None:
+                if sort not in featuretypes:
+                    raise BadRequest("InvalidSort", f"The specified column does not exist: {sort}")
+                if order not in (ASCENDING, DESCENDING):
+                    raise BadRequest("InvalidOrder", "order must be asc or desc")
+
+                rows, positions = sort_rows(
+                    name, metadata, sort, order, row_filter=row_filter, columns=columns
+                )
+                if page_size == -1:
+                    batches = iter_positions(rows, positions, columns=columns)
+                    return stream_dataset(dataset, batches, media_type=media_type)
+
+                total = len(positions)
+                if total or page != 1:
+                    start, end = page_bounds(page, page_size, total)
+                    positions = positions[start:end]
+                content = take_rows(rows, positions, columns=columns)
+                dataset.update({"data": content, "total": total})
+                return dataset
+
+            if page_size == -1:
+                if row_filter is not None:
+                    batches = filter_batches(name, metadata, row_filter, columns=columns)
+                else:
+                    batches = iter_rows(name, metadata, columns=columns)
+                return stream_dataset(dataset, batches, media_type=media_type)
+
+            if row_filter is not None:
+                content, total = filter_rows(
+                    name, metadata, row_filter, page=page, page_size=page_size, columns=columns
+                )
+            else:
+                content, total = read_rows(name, metadata, page=page, page_size=page_size, columns=columns)
+            dataset.update({"data": content, "total": total})
         return dataset
     except FileNotFoundError:
         raise NOT_FOUND
@@ -245,6 +686,394 @@ def get_dataset(name, page=1, page_size=10):
         raise BadRequest("ValueError", VALUE_ERROR_MESSAGE)
 
 
+def select_columns(available, columns):
+    """
+    Checks the columns asked for a projection of a dataset.
+
+    Parameters
+    ----------
+    available : list
+        The dataset columns.
+    columns : list
+        The names of the columns asked for, or None.
+
+    Returns
+    -------
+    list
+        The columns, without duplicates, or None for all columns.
+
+    Raises
+    ------
+    BadRequest
+        When a column does not exist.
+    """
+    if not columns:
+        return None
+
+    columns = list(dict.fromkeys(columns))
+    names = set(available)
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise BadRequest("InvalidColumns", f"The specified columns do not exist: {', '.join(missing)}")
+    if columns == list(available):
+        return None
+    return columns
+
+
+def read_rows(name, metadata, page, page_size, columns=None):
+    """
+    Reads the rows of a dataset page from the cheapest source available: the
+    columnar copy, whose decoded row groups are cached, then the CSV through
+    its row index, then the whole CSV, parsed with the dialect detected at
+    ingest when it is known and kept in the cache of parsed datasets.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    page : int
+        The page number. First page is 1.
+    page_size : int
+        The page size. -1 reads all rows.
+    columns : list
+        The columns to read. Default to None (all columns).
+
+    Returns
+    -------
+    tuple
+        The page rows (pd.DataFrame) and the number of rows of the dataset.
+
+    Raises
+    ------
+    NotFound
+        When the dataset does not contain the requested page.
+    """
+    paged = page_size != -1
+
+    if "columnar" in metadata:
+        if paged:
+            content = read_columnar_page(
+                name,
+                metadata,
+                page=page,
+                page_size=page_size,
+                columns=columns,
+                version=dataset_version(name, metadata),
+            )
+        else:
+            content = load_columnar(name, metadata, columns=columns)
+        return content, metadata["columnar"]["rows"]
+
+    if paged and "index" in metadata and "total" in metadata:
+        # reads only the bytes of the requested page
+        content = read_page(name, metadata, page=page, page_size=page_size, columns=columns)
+        return content, metadata["total"]
+
+    content = load_rows(name, metadata, columns=columns)
+    total = len(content.index)
+    if paged:
+        start, end = page_bounds(page, page_size, total)
+        content = content.iloc[start:end].reset_index(drop=True)
+    return content, total
+
+
+def filter_batches(name, metadata, row_filter, columns=None):
+    """
+    Reads the rows of a dataset that match a filter in batches. The filter is
+    evaluated on each batch as the dataset is read, with only the columns
+    returned and the columns it refers to.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    row_filter : datasets.filters.Filter
+    columns : list
+        The columns to return. Default to None (all columns).
+
+    Yields
+    ------
+    pd.DataFrame
+    """
+    read = columns
+    if columns is not None:
+        read = columns + [column for column in row_filter.columns if column not in columns]
+
+    for batch in iter_rows(name, metadata, columns=read):
+        rows = batch[row_filter(batch).to_numpy()]
+        yield rows if columns is None else rows[columns]
+
+
+def filter_rows(name, metadata, row_filter, page, page_size, columns=None):
+    """
+    Reads a page of the rows of a dataset that match a filter. The whole
+    dataset is read in batches, to count the matching rows, but only the
+    rows of the page are kept.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    row_filter : datasets.filters.Filter
+    page : int
+        The page number. First page is 1.
+    page_size : int
+    columns : list
+        The columns to return. Default to None (all columns).
+
+    Returns
+    -------
+    tuple
+        The page rows (pd.DataFrame) and the number of matching rows.
+
+    Raises
+    ------
+    NotFound
+        When the matching rows do not fill the requested page.
+    """
+    page_size = abs(page_size)
+    start = (page - 1) * page_size
+    end = start + page_size
+
+    pieces, empty, total = [], None, 0
+    for rows in filter_batches(name, metadata, row_filter, columns=columns):
+        if empty is None:
+            empty = rows.iloc[0:0]
+        if total < end and total + len(rows.index) > start:
+            pieces.append(rows.iloc[max(start - total, 0):end - total])
+        total += len(rows.index)
+
+    if total or page != 1:
+        # no match is an empty first page
+        page_bounds(page, page_size, total)
+    if not pieces:
+        return empty if empty is not None else pd.DataFrame(columns=columns), total
+    return pd.concat(pieces, ignore_index=True), total
+
+
+def sort_rows(name, metadata, sort, order, row_filter=None, columns=None):
+    """
+    Reads a dataset and the positions of its rows sorted by a column. The
+    sort permutation is cached by dataset version, column, order and
+    featuretype, so that the pages of a sorted dataset are not sorted again;
+    the rows come from the cache of parsed datasets.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    sort : str
+        The sort column.
+    order : str
+        asc or desc.
+    row_filter : datasets.filters.Filter
+        Keeps only the positions of the matching rows. Default to None.
+    columns : list
+        The columns to return. Default to None (all columns).
+
+    Returns
+    -------
+    tuple
+        The rows (pd.DataFrame), with the returned columns, the sort column
+        and the columns of the filter, and the sorted positions of the
+        (matching) rows.
+    """
+    read = columns
+    if columns is not None:
+        needed = [sort] + (row_filter.columns if row_filter is not None else [])
+        read = columns + [column for column in dict.fromkeys(needed) if column not in columns]
+    version = dataset_version(name, metadata)
+    rows = load_rows(name, metadata, columns=read, version=version)
+
+    # the featuretype of the column decides how values compare, it is part
+    # of the key so that a column whose featuretype changed is sorted again
+    featuretype = metadata["featuretypes"][metadata["columns"].index(sort)]
+    key = None if version is None else (version, sort, order, featuretype)
+    positions = SORT_CACHE.get(name, key)
+    if positions is None:
+        positions = SORTS.do(
+            (name, version, sort, order, featuretype),
+            _sort_rows,
+            name,
+            key,
+            rows[sort],
+            featuretype,
+            order,
+        )
+
+    if row_filter is not None:
+        matches = row_filter(rows).to_numpy()
+        positions = positions[matches[positions]]
+    return rows, positions
+
+
+def _sort_rows(name, key, series, featuretype, order):
+    """Sorts the rows of a dataset into the cache of sort permutations."""
+    positions = sort_permutation(series, featuretype, ascending=order == ASCENDING)
+    SORT_CACHE.put(name, key, positions)
+    return positions
+
+
+def take_rows(rows, positions, columns=None):
+    """
+    Reads rows of a dataset by position.
+
+    Parameters
+    ----------
+    rows : pd.DataFrame
+    positions : np.ndarray
+    columns : list
+        The columns to return. Default to None (all columns).
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    content = rows.iloc[positions]
+    if columns is not None:
+        content = content[columns]
+    return content.reset_index(drop=True)
+
+
+def iter_positions(rows, positions, columns=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Reads rows of a dataset by position, in batches.
+
+    Parameters
+    ----------
+    rows : pd.DataFrame
+    positions : np.ndarray
+    columns : list
+        The columns to return. Default to None (all columns).
+    batch_size : int
+        Max number of rows per batch. Default to `STREAM_BATCH_SIZE`.
+
+    Yields
+    ------
+    pd.DataFrame
+    """
+    for start in range(0, len(positions), batch_size):
+        yield take_rows(rows, positions[start:start + batch_size], columns=columns)
+
+
+def load_rows(name, metadata, columns=None, version=None):
+    """
+    Reads a whole dataset, from the cache of parsed datasets when it holds
+    the stored version. Concurrent reads of a dataset share a single load.
+
+    A projection is taken from the whole dataset when it is cached, else only
+    its columns are parsed, and cached apart.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    columns : list
+        The columns to read. Default to None (all columns).
+    version : str
+        The dataset version, as returned by `dataset_version`. Default to
+        None (looked up).
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataset rows, shared with the cache: not to be modified.
+    """
+    version = version or dataset_version(name, metadata)
+    content = DATASET_CACHE.get(name, version)
+    if content is not None:
+        return content if columns is None else content[columns]
+
+    if columns is not None and version is not None:
+        version = (version, tuple(columns))
+        content = DATASET_CACHE.get(name, version)
+    if content is None:
+        content = DATASET_LOADS.do((name, version), _load_rows, name, metadata, version, columns)
+    return content
+
+
+def dataset_version(name, metadata):
+    """
+    The version of the content of a dataset, that keys its cached rows: the
+    checksum computed at ingest or, for datasets ingested before checksums
+    were kept, the ETag of the stored content.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+
+    Returns
+    -------
+    str
+        The version, or None when it is unknown.
+    """
+    version = metadata.get("sha256")
+    if version is not None:
+        return version
+
+    try:
+        etag = storage.stat_object(storage.dataset_object_name(name))["etag"]
+    except FileNotFoundError:
+        return None
+    return f"etag:{etag}" if etag else None
+
+
+def _load_rows(name, metadata, version, columns):
+    """Loads a whole dataset, or some of its columns, into the cache of parsed datasets."""
+    if "dialect" in metadata:
+        content = load_csv(name, metadata, columns=columns)
+    else:
+        content = load_dataset(name)
+        if columns is not None:
+            content = content[columns]
+    DATASET_CACHE.put(name, version, content)
+    return content
+
+
+def iter_rows(name, metadata, batch_size=STREAM_BATCH_SIZE, columns=None):
+    """
+    Reads all rows of a dataset in batches, from the columnar copy or from
+    the CSV as it is fetched, so that memory usage does not depend on the
+    dataset size.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    batch_size : int
+        Max number of rows per batch. Default to `STREAM_BATCH_SIZE`.
+    columns : list
+        The columns to read. Default to None (all columns).
+
+    Yields
+    ------
+    pd.DataFrame
+    """
+    if "columnar" in metadata:
+        yield from iter_columnar(name, metadata, batch_size=batch_size, columns=columns)
+    elif "dialect" in metadata and "size" in metadata:
+        yield from iter_csv(name, metadata, batch_size=batch_size, columns=columns)
+    else:
+        content = load_rows(name, metadata, columns=columns)
+        for start in range(0, len(content.index), batch_size):
+            yield content.iloc[start:start + batch_size]
+
+
 def download_dataset(name: str):
     """
     Download dataset from our object storage.
@@ -286,7 +1115,7 @@ def download_dataset(name: str):
     return response
 
 
-def patch_dataset(name, file_object):
+def patch_dataset(name, file_object, preview=False):
     """
     Update the dataset metadata in our object storage.
 
@@ -298,10 +1127,15 @@ def patch_dataset(name, file_object):
     file_object : dict
         File object.
 
+    preview : bool
+        Whether to add the first rows of the dataset to the response.
+        Default to False.
+
     Returns
     -------
     dict
-        The dataset details: name, columns, and filename.
+        The dataset details: name, columns, filename and total, and the
+        first rows in data when a preview is asked for.
 
     Raises
     ------
@@ -315,7 +1149,7 @@ def patch_dataset(name, file_object):
         raise BadRequest("NoFeatureTypes", "No featuretypes part")
 
     try:
-        metadata = stat_dataset(name)
+        metadata = METADATA_CACHE.get(name, stat_dataset)
     except FileNotFoundError:
         raise NOT_FOUND
 
@@ -338,13 +1172,36 @@ def patch_dataset(name, file_object):
     # uses PlatIAgro SDK to update the dataset metadata
     metadata["featuretypes"] = featuretypes
     update_dataset_metadata(name=name, metadata=metadata)
-    return get_dataset(name)
+    METADATA_CACHE.put(name, metadata)
+    record_dataset(name, metadata)
+    DATASET_CACHE.invalidate(name)
+
+    dataset = {
+        "name": name,
+        "filename": metadata.get("original-filename"),
+        "columns": [
+            {"name": col, "featuretype": ftype} for col, ftype in zip(columns, featuretypes)
+        ],
+    }
+    if "total" in metadata:
+        dataset["total"] = metadata["total"]
+
+    if preview:
+        # the first page is read from the columnar copy or through the row
+        # index when the dataset has them, not from the whole dataset
+        content, total = read_rows(name, metadata, page=1, page_size=PREVIEW_PAGE_SIZE)
+        dataset.update({"data": content, "total": total})
+    return dataset
 
 
-def read_into_dataframe(file, filename=None, nrows=100, max_characters=50):
+def read_into_dataframe(file, filename=None, nrows=100, max_characters=50, encoding=None):
     """
     Reads a file into a DataFrame.
-    Infers the file encoding and whether a header column exists
+    Infers the file encoding and its dialect (separator, quote character and
+    whether a header column exists) from a sample of its first lines, then
+    parses its first rows with the python engine.
+    The dialect, along with the encoding and compression, is kept in
+    `df.attrs["dialect"]`.
     The file can be in any format (.csv, .txt, .zip, .gif,...).
     If it's not a .csv file, it will throw an exception (pandas.errors.EmptyDataError).
     One-column .csv gives exception there in try...except.
@@ -359,6 +1216,8 @@ def read_into_dataframe(file, filename=None, nrows=100, max_characters=50):
         Number of rows to peek. Default to 100.
     max_characters : int
         Max characters a column name can have to be distinguished from a real text value. Default to 50.
+    encoding : str
+        File encoding. Detected from samples of the file when not given.
 
     Returns
     -------
@@ -368,69 +1227,51 @@ def read_into_dataframe(file, filename=None, nrows=100, max_characters=50):
     Raises
     ------
     pandas.errors.EmptyDataError
+    csv.Error
+        When the separator can't be determined.
 
     Notes
     -----
     If no filename is given, a hex uuid will be used as the file name.
     """
 
-    detector = UniversalDetector()
-    for line, text in enumerate(file):
-        detector.feed(text)
-        if detector.done or line > nrows:
-            break
-    detector.close()
-    encoding = detector.result.get("encoding")
-
     if filename is None:
         filename = uuid4().hex
 
     compression = infer_compression(filename, "infer")
 
-    file.seek(0, SEEK_SET)
+    if encoding is None:
+        with metrics.timer("ingest_stage", stage="encoding"):
+            encoding = detect_encoding(file, compression=compression)
 
-    pdread = TextIOWrapper(file, encoding=encoding)
+    with metrics.timer("ingest_stage", stage="dialect"):
+        dialect = detect_dialect(file, encoding=encoding, compression=compression)
+    dialect.update({"encoding": encoding, "compression": compression})
 
-    try:
-        # check if the file has header.
-        sniffer = csv.Sniffer()
-        pdread.seek(0, SEEK_SET)
-        pdreadline = pdread.readline()
-        pdreadline += pdread.readline()
-        has_header = sniffer.has_header(pdreadline)
-        sep = None
-
-    except csv.Error:
-        sep = ","
-        has_header = True
-
-    # Prefix and header
-    header = "infer" if has_header else None
-    prefix = None if header else "col"
-
-    pdread.seek(0, SEEK_SET)
-    df = pd.read_csv(
-        pdread,
-        encoding=encoding,
-        compression=compression,
-        sep=sep,
-        engine="python",
-        header=header,
-        nrows=nrows,
-        prefix=prefix,
-    )
+    with metrics.timer("ingest_stage", stage="preview"):
+        # the python engine reads only the lines of the preview
+        df = read_csv(file, dialect, nrows=nrows, engine="python")
+    df.attrs["dialect"] = dialect
     return df
 
 
-def generate_name(filename, attempt=1):
+def generate_name(filename):
     """Generates a dataset name from a given filename.
 
+    Reserves the name too, so that no other request takes it before the
+    dataset is stored: the names in use are listed once, the next free
+    '-NUMBER' suffix is picked and a reservation object is stored under the
+    new name, while a lock shared by the workers of the host is held.
+
+    The lock is a local file, and the reservation object is written whether
+    it exists or not: names are only reserved between the workers of a single
+    host. Replicas on other hosts may still pick the same name at the same
+    time, and the last dataset stored under it wins.
+
     Parameters
     ----------
     filename : str
         Source filename.
-    attempt : int
-        The current attempt of generating a new name. Default to 1.
 
     Returns
     -------
@@ -445,20 +1286,69 @@ def generate_name(filename, attempt=1):
         .replace(b" ", b"-")
         .decode()
     )
+    stem, extension = splitext(name)
 
-    if attempt > 1:
-        # adds a suffix '-NUMBER' to filename
-        name, extension = splitext(name)
-        name = f"{name}-{attempt}{extension}"
+    with names_lock():
+        taken = set(storage.list_dataset_names(prefix=stem))
+        attempt = 1
+        candidate = name
+        while True:
+            while candidate in taken:
+                # adds a suffix '-NUMBER' to filename
+                attempt += 1
+                candidate = f"{stem}-{attempt}{extension}"
+
+            try:
+                # check if the name is really free, in case of a stale listing
+                METADATA_CACHE.get(candidate, stat_dataset, cached_missing=False)
+            except FileNotFoundError:
+                break
+            taken.add(candidate)
 
-    try:
-        # check if final_name is already in use
-        stat_dataset(name)
-    except FileNotFoundError:
-        return name
+        storage.put_json(reservation_object_name(candidate), {"filename": filename})
+    return candidate
 
-    # if it is already in use,
-    return generate_name(filename, attempt + 1)
+
+def release_name(name):
+    """
+    Releases a name reserved by `generate_name`.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    """
+    storage.remove(reservation_object_name(name))
+
+
+def reservation_object_name(name):
+    """
+    The object that reserves a dataset name until the dataset is stored.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+
+    Returns
+    -------
+    str
+    """
+    return storage.sidecar_object_name(name, RESERVATION_EXTENSION)
+
+
+@contextmanager
+def names_lock():
+    """
+    Serializes name generation between the threads and the worker processes
+    of a host.
+    """
+    with open(NAMES_LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
 
 
 def get_featuretypes(name):
@@ -481,7 +1371,7 @@ def get_featuretypes(name):
         When the dataset does not exist.
     """
     try:
-        metadata = stat_dataset(name)
+        metadata = METADATA_CACHE.get(name, stat_dataset)
     except FileNotFoundError:
         raise NOT_FOUND
 
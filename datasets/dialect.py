@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""Detection of the encoding and CSV dialect of uploaded files."""
+import bz2
+import codecs
+import csv
+import gzip
+import lzma
+import zipfile
+from contextlib import contextmanager
+from os import SEEK_END, SEEK_SET
+
+import pandas as pd
+from chardet.universaldetector import UniversalDetector
+
+DIALECT_SAMPLE_SIZE = 64 * 1024  # bytes
+ENCODING_HEAD_SIZE = 64 * 1024  # bytes
+ENCODING_SAMPLE_SIZE = 16 * 1024  # bytes, from the middle and from the tail
+DEFAULT_SEP = ","
+DEFAULT_QUOTECHAR = '"'
+
+OPENERS = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+# utf-32 marks must be checked before the utf-16 ones they start with
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+@contextmanager
+def open_decompressed(file, compression=None):
+    """
+    Opens a stream of the decompressed content of a file.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    compression : str
+        The file compression, as inferred by pandas. Default to None.
+
+    Yields
+    ------
+    IO
+        A binary file.
+
+    Raises
+    ------
+    csv.Error
+        When the compression is not supported, or a zip archive does not
+        contain a single file.
+    """
+    if compression is None:
+        yield file
+        return
+
+    if compression == "zip":
+        with zipfile.ZipFile(file) as archive:
+            members = archive.namelist()
+            if len(members) != 1:
+                raise csv.Error("Zip archives must contain a single file")
+            with archive.open(members[0]) as member:
+                yield member
+        return
+
+    opener = OPENERS.get(compression)
+    if opener is None:
+        raise csv.Error(f"Unsupported compression: {compression}")
+
+    with opener(file, "rb") as member:
+        yield member
+
+
+def detect_encoding(file, compression=None):
+    """
+    Detects the encoding of a file from a fixed number of bytes, whatever its
+    size: its head and, for uncompressed files, samples of its middle and of
+    its tail.
+
+    A byte order mark, or samples that are pure ASCII or valid UTF-8, settle
+    the encoding right away, and NUL bytes tell a binary file. Otherwise the
+    samples are fed to chardet.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    compression : str
+        The file compression, as inferred by pandas. Default to None.
+
+    Returns
+    -------
+    str
+        The encoding, or None when it could not be guessed.
+    """
+    try:
+        samples, at_end = _read_encoding_samples(file, compression)
+    except (csv.Error, EOFError, OSError, lzma.LZMAError, zipfile.BadZipFile):
+        return None
+
+    for bom, encoding in BOMS:
+        if samples[0].startswith(bom):
+            return encoding
+
+    if any(b"\x00" in sample for sample in samples):
+        return None
+
+    # ascii is reported as utf-8, which also reads any byte that was not sampled
+    if all(sample.isascii() for sample in samples):
+        return "utf-8"
+
+    last = len(samples) - 1
+    if all(
+        _is_utf8(sample, cut_start=index > 0, cut_end=index < last or not at_end)
+        for index, sample in enumerate(samples)
+    ):
+        return "utf-8"
+
+    detector = UniversalDetector()
+    for sample in samples:
+        detector.feed(sample)
+        if detector.done:
+            break
+    detector.close()
+
+    encoding = detector.result.get("encoding")
+    return "utf-8" if encoding == "ascii" else encoding
+
+
+def _read_encoding_samples(file, compression):
+    """
+    Reads the head, middle and tail samples used to detect the encoding, and
+    tells whether the last one reaches the end of the file.
+    """
+    try:
+        if compression is not None:
+            # decompressed streams can't be sought cheaply, so only the head is read
+            with open_decompressed(file, compression) as stream:
+                head = stream.read(ENCODING_HEAD_SIZE)
+            return [head], len(head) < ENCODING_HEAD_SIZE
+
+        file.seek(0, SEEK_END)
+        size = file.tell()
+        file.seek(0, SEEK_SET)
+        samples = [file.read(ENCODING_HEAD_SIZE)]
+
+        middle = max(ENCODING_HEAD_SIZE, size // 2 - ENCODING_SAMPLE_SIZE // 2)
+        tail = max(middle + ENCODING_SAMPLE_SIZE, size - ENCODING_SAMPLE_SIZE)
+        for offset in (middle, tail):
+            if offset < size:
+                file.seek(offset, SEEK_SET)
+                samples.append(file.read(ENCODING_SAMPLE_SIZE))
+        return samples, file.tell() >= size
+    finally:
+        file.seek(0, SEEK_SET)
+
+
+def _is_utf8(sample, cut_start, cut_end):
+    """
+    Tells whether a sample is valid UTF-8. Characters cut at the boundaries
+    of the sample are ignored.
+    """
+    if cut_start:
+        # skips the continuation bytes of a character that started before
+        start = 0
+        while start < min(3, len(sample)) and 0x80 <= sample[start] <= 0xBF:
+            start += 1
+        sample = sample[start:]
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=not cut_end)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def read_sample(file, encoding=None, compression=None, size=DIALECT_SAMPLE_SIZE):
+    """
+    Decodes the first complete lines of a file, up to a fixed byte budget.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    encoding : str
+        Default to None (utf-8).
+    compression : str
+        The file compression, as inferred by pandas. Default to None.
+    size : int
+        Max number of bytes to read. Default to 64KB.
+
+    Returns
+    -------
+    list
+        The lines of the sample, with their line breaks.
+
+    Raises
+    ------
+    UnicodeDecodeError
+        When the sample is not valid for the encoding.
+    csv.Error
+        When the file can't be decompressed.
+    """
+    file.seek(0, SEEK_SET)
+    try:
+        with open_decompressed(file, compression) as stream:
+            data = stream.read(size)
+    except (EOFError, OSError, lzma.LZMAError, zipfile.BadZipFile) as e:
+        raise csv.Error(str(e))
+    finally:
+        file.seek(0, SEEK_SET)
+
+    # a multi-byte character may have been cut at the end of the sample
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")()
+    lines = decoder.decode(data, final=len(data) < size).splitlines(True)
+
+    if len(data) == size and len(lines) > 1:
+        # drops the last line, that is probably incomplete
+        lines = lines[:-1]
+    return lines
+
+
+def detect_dialect(file, encoding=None, compression=None):
+    """
+    Detects the separator, quote character and header presence of a CSV file
+    from a sample of its first lines.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    encoding : str
+        Default to None (utf-8).
+    compression : str
+        The file compression, as inferred by pandas. Default to None.
+
+    Returns
+    -------
+    dict
+        The dialect: sep, quotechar and header.
+
+    Raises
+    ------
+    UnicodeDecodeError
+        When the sample is not valid for the encoding.
+    csv.Error
+        When the separator can't be determined.
+    """
+    lines = read_sample(file, encoding=encoding, compression=compression)
+    sniffer = csv.Sniffer()
+
+    try:
+        # check if the file has header.
+        header = sniffer.has_header("".join(lines[:2]))
+    except csv.Error:
+        return {"sep": DEFAULT_SEP, "quotechar": DEFAULT_QUOTECHAR, "header": True}
+
+    # the separator and quote character are sniffed from the first line, like
+    # pandas' python engine does: sniffing more lines is slower and tends to
+    # mistake spaces within texts for the separator
+    dialect = sniffer.sniff(lines[0])
+    return {"sep": dialect.delimiter, "quotechar": dialect.quotechar, "header": header}
+
+
+def read_csv(file, dialect, nrows=None, names=None, usecols=None, dtype=None, engine="c"):
+    """
+    Parses a CSV file with a known dialect. Uses the C engine, or the python
+    engine for the few malformed files the C engine rejects.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    dialect : dict
+        The dialect: sep, quotechar, header, encoding and compression.
+    nrows : int
+        Number of rows to read. Default to None (all rows).
+    names : list
+        The column names. Default to None: read from the header, or col0,
+        col1, ... when the file has no header.
+    usecols : list
+        The names of the columns to parse, in the order they are returned.
+        Default to None (all columns).
+    dtype : dict
+        The dtype of each column. Default to None (inferred).
+    engine : str
+        "c", or "python" to only use the python engine: it parses line by
+        line, while the C engine tokenizes a whole buffer first, so it is
+        faster to read the first rows of a large file. Default to "c".
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    if engine == "c":
+        try:
+            return _read_csv(file, dialect, nrows, names, usecols, dtype, engine="c")
+        except pd.errors.ParserError:
+            pass
+    return _read_csv(file, dialect, nrows, names, usecols, dtype, engine="python")
+
+
+def _read_csv(file, dialect, nrows, names, usecols, dtype, engine):
+    """Parses a CSV file with the given pandas engine."""
+    header = dialect["header"]
+    file.seek(0, SEEK_SET)
+    df = pd.read_csv(
+        file,
+        encoding=dialect.get("encoding"),
+        compression=dialect.get("compression"),
+        sep=dialect["sep"],
+        quotechar=dialect["quotechar"],
+        engine=engine,
+        header=(0 if header else None) if names else ("infer" if header else None),
+        names=names,
+        usecols=usecols,
+        dtype=dtype,
+        nrows=nrows,
+    )
+    if names is None and not header:
+        df.columns = [f"col{index}" for index in range(len(df.columns))]
+    if usecols is not None:
+        # pandas keeps the order of the file
+        df = df[usecols]
+    return df
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Thread pools that run the blocking storage and pandas calls off the event loop.
+
+Uploads, background ingest jobs, dataset reads and metadata calls use
+separate pools, so that slow ingests never delay the light requests that
+share the same worker process.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+READ_WORKERS = int(os.getenv("READ_WORKERS", "4"))
+METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "8"))
+STAT_WORKERS = int(os.getenv("STAT_WORKERS", "16"))
+
+INGEST_POOL = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+JOB_POOL = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+READ_POOL = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="read")
+METADATA_POOL = ThreadPoolExecutor(max_workers=METADATA_WORKERS, thread_name_prefix="metadata")
+# reads the metadata of many datasets at once, on behalf of the other pools
+STAT_POOL = ThreadPoolExecutor(max_workers=STAT_WORKERS, thread_name_prefix="stat")
+
+
+async def run_in_pool(pool, func, *args, **kwargs):
+    """
+    Runs a blocking function in the given pool and awaits its result.
+
+    Parameters
+    ----------
+    pool : concurrent.futures.Executor
+    func : callable
+    *args
+        Positional arguments passed to `func`.
+    **kwargs
+        Keyword arguments passed to `func`.
+
+    Returns
+    -------
+    The value returned by `func`.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(pool, partial(func, *args, **kwargs))
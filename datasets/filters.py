@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Row filters: expressions parsed once, then evaluated on batches of rows.
+
+An expression compares columns with values, and combines comparisons with
+and, or, not and parentheses::
+
+    Species = 'Iris-setosa' and (SepalLengthCm >= 5 or PetalWidthCm is null)
+    "Petal Width" in (0.2, 0.4) and not Species != 'Iris-virginica'
+
+Columns are names, or double-quoted when they are not identifiers. Texts are
+single-quoted. Values are typed by the featuretype of their column: numbers
+for Numerical columns, dates (ISO 8601 texts) for DateTime columns, and texts
+or numbers for Categorical columns, which only support =, != and in.
+Comparisons of missing values are unknown, as in SQL: missing values match
+neither a comparison nor its negation with not, only "is null".
+"""
+import re
+
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from platiagro.featuretypes import CATEGORICAL, DATETIME, NUMERICAL
+
+from datasets.exceptions import BadRequest
+
+TOKENS = re.compile(
+    r"\s*(?:"
+    r"(?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+    r"|'(?P<text>(?:[^']|'')*)'"
+    r'|"(?P<quoted>(?:[^"]|"")*)"'
+    r"|(?P<operator><=|>=|!=|==|=|<|>|\(|\)|,)"
+    r"|(?P<word>[A-Za-z_][\w.]*)"
+    r")"
+)
+KEYWORDS = ("and", "or", "not", "in", "is", "null")
+COMPARISONS = {
+    "=": lambda series, value: series == value,
+    "==": lambda series, value: series == value,
+    "!=": lambda series, value: series != value,
+    "<": lambda series, value: series < value,
+    "<=": lambda series, value: series <= value,
+    ">": lambda series, value: series > value,
+    ">=": lambda series, value: series >= value,
+}
+EQUALITIES = ("=", "==", "!=")
+
+
+class Filter:
+    """
+    A row filter.
+
+    Parameters
+    ----------
+    expression : str
+    columns : list
+        The dataset columns.
+    featuretypes : list
+        The featuretype of each column.
+
+    Raises
+    ------
+    BadRequest
+        When the expression is invalid, or refers to columns that do not
+        exist.
+    """
+
+    def __init__(self, expression, columns, featuretypes):
+        self._featuretypes = dict(zip(columns, featuretypes))
+        self._tokens = _tokenize(expression)
+        self._position = 0
+        self.columns = []
+
+        self._predicate = self._parse_or()
+        if self._peek() is not None:
+            raise _invalid(f"unexpected {self._peek()[1]!r}")
+
+    def __call__(self, df):
+        """
+        Evaluates the filter on a batch of rows.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The rows, with every column the filter refers to.
+
+        Returns
+        -------
+        pd.Series
+            Whether each row matches.
+
+        Raises
+        ------
+        BadRequest
+            When values of the filter can't be compared with the column.
+        """
+        try:
+            return self._predicate(df).fillna(False).astype(bool)
+        except TypeError as e:
+            # eg. dates with and without time zone
+            raise _invalid(str(e))
+
+    def _parse_or(self):
+        operands = [self._parse_and()]
+        while self._accept_keyword("or"):
+            operands.append(self._parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda df: _reduce(operands, df, lambda a, b: a | b)
+
+    def _parse_and(self):
+        operands = [self._parse_not()]
+        while self._accept_keyword("and"):
+            operands.append(self._parse_not())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda df: _reduce(operands, df, lambda a, b: a & b)
+
+    def _parse_not(self):
+        if self._accept_keyword("not"):
+            operand = self._parse_not()
+            return lambda df: ~operand(df)
+        if self._accept("operator", "("):
+            predicate = self._parse_or()
+            self._expect("operator", ")")
+            return predicate
+        return self._parse_comparison()
+
+    def _parse_comparison(self):
+        column = self._parse_column()
+        featuretype = self._featuretypes[column]
+
+        if self._accept_keyword("is"):
+            negated = self._accept_keyword("not")
+            self._expect_keyword("null")
+            if negated:
+                return lambda df: df[column].notna()
+            return lambda df: df[column].isna()
+
+        if self._accept_keyword("in"):
+            self._expect("operator", "(")
+            values = [self._parse_value(column, featuretype)]
+            while self._accept("operator", ","):
+                values.append(self._parse_value(column, featuretype))
+            self._expect("operator", ")")
+            return lambda df: _compare_in(df[column], featuretype, values)
+
+        token = self._next()
+        if token is None or token[0] != "operator" or token[1] not in COMPARISONS:
+            raise _invalid(f"expected a comparison after {column!r}")
+        operator = token[1]
+        if featuretype == CATEGORICAL and operator not in EQUALITIES:
+            raise _invalid(f"{operator} does not apply to the Categorical column {column!r}")
+        value = self._parse_value(column, featuretype)
+        return lambda df: _compare(df[column], featuretype, operator, value)
+
+    def _parse_column(self):
+        token = self._next()
+        if token is None or token[0] not in ("word", "quoted") or _is_keyword(token):
+            raise _invalid("expected a column")
+        column = token[1]
+        if column not in self._featuretypes:
+            raise BadRequest("InvalidFilter", f"The specified column does not exist: {column}")
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def _parse_value(self, column, featuretype):
+        token = self._next()
+        if token is None or token[0] not in ("number", "text"):
+            raise _invalid(f"expected a value for {column!r}")
+        kind, value = token
+
+        if featuretype == NUMERICAL:
+            try:
+                return float(value)
+            except ValueError:
+                raise _invalid(f"{column!r} is Numerical, {value!r} is not a number")
+        if featuretype == DATETIME:
+            try:
+                return pd.Timestamp(value)
+            except ValueError:
+                raise _invalid(f"{column!r} is DateTime, {value!r} is not a date")
+        if kind == "number":
+            return _Number(value)
+        return value
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        if token is not None:
+            self._position += 1
+        return token
+
+    def _accept(self, kind, value):
+        if self._peek() == (kind, value):
+            self._position += 1
+            return True
+        return False
+
+    def _accept_keyword(self, keyword):
+        token = self._peek()
+        if token is not None and token[0] == "word" and token[1].lower() == keyword:
+            self._position += 1
+            return True
+        return False
+
+    def _expect(self, kind, value):
+        if not self._accept(kind, value):
+            raise _invalid(f"expected {value!r}")
+
+    def _expect_keyword(self, keyword):
+        if not self._accept_keyword(keyword):
+            raise _invalid(f"expected {keyword!r}")
+
+
+class _Number(float):
+    """
+    A number of a Categorical comparison, that keeps the text it was written
+    with: categories parsed as texts are compared with that text, so that
+    long codes such as 123456789 or 007 match exactly.
+    """
+
+    def __new__(cls, text):
+        number = super().__new__(cls, text)
+        number.text = text
+        return number
+
+
+def _tokenize(expression):
+    """Splits an expression into (kind, value) tokens."""
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKENS.match(expression, position)
+        if match is None or match.end() == position:
+            raise _invalid(f"unexpected {expression[position:].strip()[:20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "text":
+            value = value.replace("''", "'")
+        elif kind == "quoted":
+            value = value.replace('""', '"')
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def _is_keyword(token):
+    return token[0] == "word" and token[1].lower() in KEYWORDS
+
+
+def _reduce(operands, df, combine):
+    result = operands[0](df)
+    for operand in operands[1:]:
+        result = combine(result, operand(df))
+    return result
+
+
+def _typed(series, featuretype, value):
+    """The column values comparable to a value of the filter."""
+    if featuretype == NUMERICAL:
+        return pd.to_numeric(series, errors="coerce")
+    if featuretype == DATETIME:
+        return pd.to_datetime(series, errors="coerce")
+    if isinstance(value, float) and is_numeric_dtype(series):
+        return series
+    # categories are compared as texts, whatever the way they were parsed
+    return series.astype(str).where(series.notna())
+
+
+def _categorical_value(value, series):
+    if isinstance(value, _Number) and not is_numeric_dtype(series):
+        return value.text
+    return value
+
+
+def _compare(series, featuretype, operator, value):
+    typed = _typed(series, featuretype, value)
+    if featuretype == CATEGORICAL:
+        value = _categorical_value(value, series)
+    # missing values are unknown, so that they match neither "!=" nor "not ="
+    return COMPARISONS[operator](typed, value).astype("boolean").mask(typed.isna())
+
+
+def _compare_in(series, featuretype, values):
+    typed = _typed(series, featuretype, values[0])
+    if featuretype == CATEGORICAL:
+        values = [_categorical_value(value, series) for value in values]
+    return typed.isin(values).astype("boolean").mask(typed.isna())
+
+
+def _invalid(reason):
+    return BadRequest("InvalidFilter", f"Invalid filter: {reason}")
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Streaming ingest of uploaded files."""
+import bz2
+import io
+import lzma
+import zipfile
+import zlib
+from os import SEEK_SET
+
+import numpy as np
+
+INGEST_CHUNK_SIZE = 1024 * 1024  # 1MB
+NEWLINE = ord("\n")
+CARRIAGE_RETURN = ord("\r")
+
+DECOMPRESSORS = {
+    "gzip": lambda: zlib.decompressobj(wbits=zlib.MAX_WBITS | 16),
+    "bz2": bz2.BZ2Decompressor,
+    "xz": lzma.LZMADecompressor,
+}
+
+
+class IngestReader(io.RawIOBase):
+    """
+    A read-only file object that forwards every byte read from the source
+    file to a list of consumers (objects with an ``update(bytes)`` method,
+    such as ``hashlib`` digests).
+
+    Each byte is delivered to the consumers exactly once, even when the caller
+    seeks around (eg. to compute the stream length), so the storage write,
+    the checksum and the row count share a single read of the upload.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    consumers : list
+        Objects that will receive the stream content, in order.
+    """
+
+    def __init__(self, file, consumers=()):
+        super().__init__()
+        self._file = file
+        self._consumers = list(consumers)
+        self._file.seek(0, SEEK_SET)
+        self._position = 0
+        self._observed = 0
+
+    @property
+    def size(self):
+        """Number of bytes delivered to the consumers so far."""
+        return self._observed
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=SEEK_SET):
+        # SpooledTemporaryFile.seek does not return the new position on python 3.8
+        self._file.seek(offset, whence)
+        self._position = self._file.tell()
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, buffer):
+        data = self._file.read(len(buffer))
+        length = len(data)
+        buffer[:length] = data
+        self._observe(data)
+        self._position += length
+        return length
+
+    def finish(self):
+        """
+        Reads whatever part of the source the caller did not read, so that
+        consumers always see the whole file.
+
+        Returns
+        -------
+        int
+            The file size in bytes.
+        """
+        self.seek(self._observed, SEEK_SET)
+        while self.read(INGEST_CHUNK_SIZE):
+            pass
+        return self._observed
+
+    def _observe(self, data):
+        start, end = self._position, self._position + len(data)
+        if start <= self._observed < end:
+            chunk = memoryview(data)[self._observed - start:]
+            for consumer in self._consumers:
+                consumer.update(chunk)
+            self._observed = end
+
+
+class RowCounter:
+    """
+    Counts the records of a CSV stream, chunk by chunk.
+
+    Line breaks inside quoted fields and blank lines are not counted, and
+    gzip, bz2 and xz streams are decompressed on the fly. Records are counted
+    by their line feeds: streams with (old Mac) carriage return line endings
+    are not counted. Uncompressed streams
+    may also be indexed: the byte offset of every `index_stride`-th record is
+    kept, so that any record can later be found with a byte range read.
+
+    Parameters
+    ----------
+    compression : str
+        The stream compression, as inferred by pandas. Default to None.
+    quotechar : str
+        The character used to quote fields. Default to '"'.
+    index_stride : int
+        Distance, in records, between indexed offsets. Default to None
+        (no index).
+    """
+
+    def __init__(self, compression=None, quotechar='"', index_stride=None):
+        if compression is not None and compression not in DECOMPRESSORS:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        self._decompressor = DECOMPRESSORS[compression]() if compression else None
+        if len(quotechar.encode()) != 1:
+            raise ValueError(f"Unsupported quote character: {quotechar}")
+
+        self._quotechar = quotechar
+        self._quote = ord(quotechar)
+        self._quoted = False
+        self._line_start = True
+        self._records = 0
+        self._line_feeds = 0
+        self._carriage_returns = 0
+        self._position = 0
+        self._corrupted = False
+
+        self._stride = index_stride if compression is None else None
+        self._offsets = [0] if self._stride else None
+        self._second_offset = None
+
+    @classmethod
+    def supports(cls, compression):
+        """Tells whether streams with the given compression can be counted."""
+        return compression is None or compression in DECOMPRESSORS
+
+    @property
+    def records(self):
+        """
+        Number of records seen so far, including a header line if any.
+        None when the stream could not be decompressed, or when its lines
+        end with carriage returns only.
+        """
+        if self._corrupted or self._carriage_returns > self._line_feeds:
+            return None
+        return self._records + (0 if self._line_start else 1)
+
+    @property
+    def stride(self):
+        """Distance, in records, between indexed offsets. None when not indexed."""
+        return self._stride
+
+    @property
+    def offsets(self):
+        """
+        Byte offsets of records 0, stride, 2 * stride, ... (header included).
+        None when the stream is not indexed.
+        """
+        return self._offsets
+
+    @property
+    def second_offset(self):
+        """
+        Byte offset of the second record, ie. the first data row of a file
+        that has a header. None when the stream is not indexed.
+        """
+        return self._second_offset
+
+    @property
+    def quotechar(self):
+        """The character used to quote fields."""
+        return self._quotechar
+
+    def update(self, chunk):
+        if self._corrupted:
+            return
+
+        data = bytes(chunk)
+        if self._decompressor is not None:
+            try:
+                data = self._decompressor.decompress(data)
+            except (EOFError, OSError, lzma.LZMAError, zlib.error):
+                self._corrupted = True
+                return
+        if data:
+            self._count_lines(np.frombuffer(data, dtype=np.uint8))
+            self._position += len(data)
+
+    def _count_lines(self, array):
+        """Counts (and indexes) the line breaks that end a non-blank line."""
+        quotes = array == self._quote
+        # a line break is quoted when an odd number of quotes precede it,
+        # counting from the start of the stream
+        quoted = (np.cumsum(quotes) + self._quoted) & 1
+        breaks = (array == NEWLINE) & (quoted == 0)
+        # quotes are content, carriage returns and line breaks are not
+        content = np.cumsum(~breaks & (array != CARRIAGE_RETURN))
+        self._quoted = bool(quoted[-1])
+
+        newlines = np.flatnonzero(breaks)
+        self._line_feeds += len(newlines)
+        self._carriage_returns += int(np.count_nonzero((array == CARRIAGE_RETURN) & (quoted == 0)))
+        if not len(newlines):
+            self._line_start = self._line_start and bool(content[-1] == 0)
+            return
+
+        # content seen up to each line break: a line is blank when it adds none
+        totals = content[newlines]
+        previous = np.empty_like(totals)
+        previous[0] = 0
+        previous[1:] = totals[:-1]
+        blank = totals == previous
+        # the first line may have started in a previous chunk
+        blank[0] = blank[0] and self._line_start
+        ends = newlines[~blank]
+
+        if self._stride and len(ends):
+            if self._records == 0:
+                self._second_offset = int(ends[0]) + self._position + 1
+            numbers = np.arange(self._records + 1, self._records + len(ends) + 1)
+            starts = ends[numbers % self._stride == 0] + self._position + 1
+            self._offsets.extend(starts.tolist())
+
+        self._records += len(ends)
+        self._line_start = bool(content[-1] == totals[-1])
+
+
+def count_zip_records(file, quotechar='"'):
+    """
+    Counts the records of the CSV file inside a zip archive.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    quotechar : str
+        The character used to quote fields. Default to '"'.
+
+    Returns
+    -------
+    int
+        The number of records, including a header line if any.
+    """
+    counter = RowCounter(quotechar=quotechar)
+    with zipfile.ZipFile(file) as archive:
+        members = archive.namelist()
+        if len(members) != 1:
+            raise ValueError("Zip archives must contain a single file")
+
+        with archive.open(members[0]) as member:
+            for chunk in iter(lambda: member.read(INGEST_CHUNK_SIZE), b""):
+                counter.update(chunk)
+    return counter.records
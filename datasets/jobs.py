@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Background ingest jobs."""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from os import getenv
+from uuid import uuid4
+
+from datasets import storage
+from datasets.exceptions import NotFound
+from datasets.executors import JOB_POOL
+
+JOB_NOT_FOUND = NotFound("JobNotFound", "The specified job does not exist")
+JOBS_PREFIX = "jobs"
+JOB_TTL = int(getenv("JOB_TTL", "86400"))
+
+PENDING = "Pending"
+RUNNING = "Running"
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+
+# jobs run apart from the ingest pool, so that uploads never queue behind them
+EXECUTOR = JOB_POOL
+
+_JOBS = {}
+_LOCK = threading.Lock()
+
+
+def submit_job(dataset, func, *args, **kwargs):
+    """
+    Schedules `func` to run in the job worker pool.
+
+    Parameters
+    ----------
+    dataset : str
+        The dataset name the job works on.
+    func : callable
+    *args
+        Positional arguments passed to `func`.
+    **kwargs
+        Keyword arguments passed to `func`.
+
+    Returns
+    -------
+    dict
+        The job details.
+    """
+    job = {
+        "id": uuid4().hex,
+        "dataset": dataset,
+        "status": PENDING,
+        "createdAt": _now(),
+        "startedAt": None,
+        "finishedAt": None,
+        "timings": {},
+        "error": None,
+    }
+    _save_job(job, created=time.monotonic())
+    EXECUTOR.submit(_run_job, job["id"], func, *args, **kwargs)
+    return dict(job)
+
+
+def get_job(job_id):
+    """
+    Details an ingest job.
+
+    Parameters
+    ----------
+    job_id : str
+
+    Returns
+    -------
+    dict
+        The job details: id, dataset, status, timestamps and timings in seconds.
+
+    Raises
+    ------
+    NotFound
+        When the job does not exist.
+    """
+    with _LOCK:
+        entry = _JOBS.get(job_id)
+        if entry is not None:
+            return dict(entry["job"])
+
+    # the job may have been accepted by another worker process
+    try:
+        return storage.get_json(_job_object_name(job_id))
+    except FileNotFoundError:
+        raise JOB_NOT_FOUND
+
+
+def _run_job(job_id, func, *args, **kwargs):
+    """Runs a job, keeping its state up to date."""
+    with _LOCK:
+        created = _JOBS[job_id]["created"]
+
+    started = time.monotonic()
+    timings = {"queued": round(started - created, 6)}
+    _update_job(job_id, status=RUNNING, startedAt=_now(), timings=dict(timings))
+
+    error = None
+    try:
+        func(*args, **kwargs)
+    except Exception as e:
+        logging.exception(f"Ingest job {job_id} failed")
+        error = str(e) or type(e).__name__
+
+    timings["running"] = round(time.monotonic() - started, 6)
+    _update_job(
+        job_id,
+        status=FAILED if error else SUCCEEDED,
+        finishedAt=_now(),
+        timings=timings,
+        error=error,
+    )
+    remove_expired_jobs()
+
+
+def remove_expired_jobs():
+    """
+    Removes the stored details of the jobs that were last updated more than
+    `JOB_TTL` seconds ago. Errors are logged, as they must not fail the job
+    that triggered the cleanup.
+    """
+    expiry = datetime.now(timezone.utc) - timedelta(seconds=JOB_TTL)
+    try:
+        for object_name, last_modified in storage.list_objects(f"{JOBS_PREFIX}/").items():
+            if last_modified is not None and last_modified < expiry:
+                storage.remove(object_name)
+    except Exception:
+        logging.exception("Could not remove expired jobs")
+
+
+def _update_job(job_id, **changes):
+    with _LOCK:
+        entry = _JOBS[job_id]
+        entry["job"].update(changes)
+        job = dict(entry["job"])
+
+    if _persist_job(job) and job["status"] in (SUCCEEDED, FAILED):
+        # finished jobs are served from the object storage from now on
+        with _LOCK:
+            _JOBS.pop(job_id, None)
+
+
+def _save_job(job, created):
+    with _LOCK:
+        _JOBS[job["id"]] = {"job": job, "created": created}
+    _persist_job(job)
+
+
+def _persist_job(job):
+    """Stores the job details so that every worker process can report it."""
+    try:
+        storage.put_json(_job_object_name(job["id"]), job)
+        return True
+    except Exception:
+        logging.exception(f"Could not store the state of job {job['id']}")
+        return False
+
+
+def _job_object_name(job_id):
+    return f"{JOBS_PREFIX}/{job_id}.json"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
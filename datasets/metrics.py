@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+In-process counters and timers, exposed in the Prometheus text format.
+
+Values are kept per worker process.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+NAMESPACE = "datasets"
+
+_VALUES = defaultdict(float)
+_LOCK = threading.Lock()
+
+
+def increment(name, value=1, **labels):
+    """
+    Adds `value` to a counter.
+
+    Parameters
+    ----------
+    name : str
+        The metric name, without the namespace.
+    value : int or float
+        Default to 1.
+    **labels
+        Label values that identify the series.
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with _LOCK:
+        _VALUES[key] += value
+
+
+def observe(name, seconds, **labels):
+    """
+    Records the duration of an operation.
+
+    Parameters
+    ----------
+    name : str
+        The metric name, without the namespace.
+    seconds : float
+    **labels
+        Label values that identify the series.
+    """
+    increment(f"{name}_seconds_sum", seconds, **labels)
+    increment(f"{name}_seconds_count", **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Records the duration of the wrapped block.
+
+    Parameters
+    ----------
+    name : str
+        The metric name, without the namespace.
+    **labels
+        Label values that identify the series.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def get_value(name, **labels):
+    """
+    Reads the current value of a metric.
+
+    Parameters
+    ----------
+    name : str
+    **labels
+
+    Returns
+    -------
+    float
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with _LOCK:
+        return _VALUES.get(key, 0.0)
+
+
+def render():
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Returns
+    -------
+    str
+    """
+    with _LOCK:
+        values = sorted(_VALUES.items())
+
+    lines = []
+    for (name, labels), value in values:
+        series = f"{NAMESPACE}_{name}"
+        if labels:
+            pairs = ",".join(f'{key}="{label}"' for key, label in labels)
+            series = f"{series}{{{pairs}}}"
+        lines.append(f"{series} {value:g}")
+    return "\n".join(lines) + "\n"
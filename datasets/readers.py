@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""Reads pages of stored datasets without loading them entirely."""
+from io import BufferedReader, BytesIO
+from os import getenv
+
+import pandas as pd
+
+from datasets import storage
+from datasets.dialect import read_csv
+from datasets.exceptions import NotFound
+
+PAGE_NOT_FOUND = NotFound("PageNotFound", "The specified page does not exist")
+INDEX_EXTENSION = "index"
+ROW_INDEX_STRIDE = int(getenv("ROW_INDEX_STRIDE", "1024"))
+READ_BUFFER_SIZE = 1024 * 1024  # bytes per range request while streaming
+
+
+def page_bounds(page, page_size, total):
+    """
+    Finds the rows of a page.
+
+    Parameters
+    ----------
+    page : int
+        The page number. First page is 1.
+    page_size : int
+    total : int
+        Number of rows of the dataset.
+
+    Returns
+    -------
+    tuple
+        The first row and the row after the last one (0-based).
+
+    Raises
+    ------
+    NotFound
+        When the dataset does not contain the requested page.
+    """
+    page_size = abs(page_size)
+    start = (page - 1) * page_size
+    if page < 1 or page_size == 0 or start >= total:
+        raise PAGE_NOT_FOUND
+    return start, min(start + page_size, total)
+
+
+def csv_dtypes(metadata):
+    """
+    The dtypes to parse the columns of a dataset with, so that every page and
+    batch of rows gets the types of the whole file.
+
+    Parameters
+    ----------
+    metadata : dict
+        The dataset metadata.
+
+    Returns
+    -------
+    dict
+        The dtype of each column, or None when they were not kept at ingest.
+    """
+    if "dtypes" not in metadata:
+        return None
+    return {
+        column: str if dtype == "object" else dtype
+        for column, dtype in zip(metadata["columns"], metadata["dtypes"])
+    }
+
+
+def build_index(counter, dialect):
+    """
+    Builds the row index of a dataset from the offsets kept while it was stored.
+
+    Parameters
+    ----------
+    counter : datasets.ingest.RowCounter
+    dialect : dict
+        The CSV dialect: sep, quotechar, header, encoding and compression.
+
+    Returns
+    -------
+    dict
+        The index, or None when the stream was not indexed.
+    """
+    if counter.offsets is None:
+        return None
+
+    return {
+        "stride": counter.stride,
+        "offsets": counter.offsets,
+        "header": dialect["header"],
+        "data-offset": counter.second_offset if dialect["header"] else 0,
+        "sep": dialect["sep"],
+        "quotechar": dialect["quotechar"],
+        "encoding": dialect["encoding"] or "utf-8",
+    }
+
+
+def save_index(name, index):
+    """
+    Stores the row index next to the dataset.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    index : dict
+    """
+    storage.put_json(storage.sidecar_object_name(name, INDEX_EXTENSION), index)
+
+
+def read_page(name, metadata, page, page_size, columns=None):
+    """
+    Reads a page of a dataset with a single byte range read, located through
+    its row index. The cost does not depend on the page number.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    page : int
+        The page number. First page is 1.
+    page_size : int
+    columns : list
+        The columns to parse. Default to None (all columns).
+
+    Returns
+    -------
+    pd.DataFrame
+        The page rows.
+
+    Raises
+    ------
+    NotFound
+        When the dataset does not contain the requested page.
+    """
+    start, end = page_bounds(page, page_size, metadata["total"])
+    index = storage.get_json(storage.sidecar_object_name(name, INDEX_EXTENSION))
+    stride, offsets = index["stride"], index["offsets"]
+
+    # offsets point to records, which include the header line
+    header = 1 if index["header"] else 0
+    first, last = start + header, end + header
+    block = first // stride
+    next_block = -(-last // stride)
+
+    if block == 0 and header:
+        # starts right after the header, so that it is not parsed as data
+        offset, skip = index["data-offset"], start
+    else:
+        offset, skip = offsets[block], first - block * stride
+
+    length = None
+    if next_block < len(offsets):
+        length = offsets[next_block] - offset
+
+    data = storage.get_bytes(storage.dataset_object_name(name), offset, length)
+    df = pd.read_csv(
+        BytesIO(data),
+        header=None,
+        names=metadata["columns"],
+        sep=index["sep"],
+        quotechar=index.get("quotechar", '"'),
+        encoding=index["encoding"],
+        usecols=columns,
+        dtype=csv_dtypes(metadata),
+        nrows=skip + end - start,
+    )
+    if columns is not None:
+        df = df[columns]
+    return df.iloc[skip:].reset_index(drop=True)
+
+
+def load_csv(name, metadata, columns=None):
+    """
+    Reads a whole dataset, parsed the same way it was at ingest, with the
+    dialect kept in its metadata.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    columns : list
+        The columns to parse. Default to None (all columns).
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    data = storage.get_bytes(storage.dataset_object_name(name))
+    return read_csv(
+        BytesIO(data),
+        metadata["dialect"],
+        names=metadata["columns"],
+        usecols=columns,
+        dtype=csv_dtypes(metadata),
+    )
+
+
+def iter_csv(name, metadata, batch_size, columns=None):
+    """
+    Reads a whole dataset in batches of rows, parsed with the dialect and the
+    dtypes kept in its metadata. The object is fetched with range requests as it is parsed,
+    so memory usage does not depend on the dataset size.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    metadata : dict
+        The dataset metadata.
+    batch_size : int
+        Max number of rows per batch.
+    columns : list
+        The columns to parse. Default to None (all columns).
+
+    Yields
+    ------
+    pd.DataFrame
+    """
+    dialect = metadata["dialect"]
+    source = storage.RangeReader(storage.dataset_object_name(name), metadata["size"])
+    with BufferedReader(source, buffer_size=READ_BUFFER_SIZE) as file:
+        batches = pd.read_csv(
+            file,
+            encoding=dialect["encoding"],
+            compression=dialect["compression"],
+            sep=dialect["sep"],
+            quotechar=dialect["quotechar"],
+            header=0 if dialect["header"] else None,
+            names=metadata["columns"],
+            usecols=columns,
+            dtype=csv_dtypes(metadata),
+            chunksize=batch_size,
+        )
+        with batches:
+            for batch in batches:
+                yield batch if columns is None else batch[columns]
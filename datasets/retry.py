@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Retries with exponential backoff for transient storage failures."""
+import asyncio
+import logging
+import random
+
+from minio.error import S3Error
+from urllib3.exceptions import HTTPError
+
+from datasets import metrics
+
+MAX_RETRIES = 10
+BASE_DELAY = 0.1  # seconds
+MAX_DELAY = 5.0  # seconds
+
+TRANSIENT_S3_CODES = (
+    "InternalError",
+    "RequestTimeout",
+    "ServiceUnavailable",
+    "SlowDown",
+)
+
+
+def is_transient(exception):
+    """
+    Tells whether an error may go away by simply trying again.
+
+    Network and object storage availability errors are transient; invalid
+    input, parse errors and missing objects are not.
+
+    Parameters
+    ----------
+    exception : Exception
+
+    Returns
+    -------
+    bool
+    """
+    if isinstance(exception, S3Error):
+        return exception.code in TRANSIENT_S3_CODES
+    return isinstance(exception, (ConnectionError, TimeoutError, HTTPError))
+
+
+async def retry(operation, func, *args, retries=MAX_RETRIES, **kwargs):
+    """
+    Awaits `func(*args, **kwargs)`, retrying transient errors with an
+    exponential backoff and full jitter, without blocking the event loop.
+
+    Parameters
+    ----------
+    operation : str
+        A name for the operation, used as a label in metrics.
+    func : coroutine function
+    *args
+        Positional arguments passed to `func`.
+    retries : int
+        Max number of retries. Default to 10.
+    **kwargs
+        Keyword arguments passed to `func`.
+
+    Returns
+    -------
+    The value returned by `func`.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+
+            attempt += 1
+            delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+            logging.info(f"{operation} failed with a transient error: {e}")
+            logging.info(f"retries: {attempt} of {retries}, next in {delay:.2f}s")
+            metrics.increment("retries_total", operation=operation)
+            await asyncio.sleep(delay)
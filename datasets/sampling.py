@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Representative samples of whole datasets, drawn while streaming them."""
+import csv
+import logging
+from os import SEEK_SET, getenv
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_SIZE = int(getenv("FEATURETYPES_SAMPLE_SIZE", "1000"))
+SAMPLE_CHUNK_SIZE = 10000  # rows
+BOOLEAN_VALUES = {"True", "False", "TRUE", "FALSE", "true", "false"}
+# numbers pandas parses as floats, even when they have no fractional part
+FLOAT_MARKS = r"[.eEnN]"
+
+
+class ColumnStats:
+    """
+    Whole-file type statistics of the columns of a CSV file, gathered chunk by
+    chunk from the raw (text) values.
+
+    Parameters
+    ----------
+    columns : list
+        The column names.
+    """
+
+    def __init__(self, columns):
+        self._columns = list(columns)
+        self.rows = 0
+        self.values = np.zeros(len(columns), dtype=np.int64)
+        self.numbers = np.zeros(len(columns), dtype=np.int64)
+        self.integers = np.zeros(len(columns), dtype=np.int64)
+        self.booleans = np.zeros(len(columns), dtype=np.int64)
+
+    def update(self, chunk):
+        """Counts the values, numbers, integers and booleans of each column of a chunk."""
+        values = chunk.notna()
+        numbers = chunk.apply(pd.to_numeric, errors="coerce").notna()
+        integers = numbers & ~chunk.apply(lambda column: column.astype(str).str.contains(FLOAT_MARKS))
+        booleans = chunk.isin(BOOLEAN_VALUES)
+        self.rows += len(chunk.index)
+        self.values += values.sum().to_numpy()
+        self.numbers += numbers.sum().to_numpy()
+        self.integers += integers.sum().to_numpy()
+        self.booleans += booleans.sum().to_numpy()
+
+    def dtypes(self):
+        """
+        The dtype pandas infers for each column from the whole file: int64,
+        float64, bool or object.
+
+        Returns
+        -------
+        list
+        """
+        dtypes = []
+        for index in range(len(self._columns)):
+            values = self.values[index]
+            if values == 0:
+                dtypes.append("float64")
+            elif self.numbers[index] == values:
+                complete = self.integers[index] == values == self.rows
+                dtypes.append("int64" if complete else "float64")
+            elif self.booleans[index] == values == self.rows:
+                dtypes.append("bool")
+            else:
+                dtypes.append("object")
+        return dtypes
+
+    def convert(self, df):
+        """
+        Gives the columns of a sample the dtypes pandas would infer from the
+        whole file: numeric or boolean only when every value of the file is
+        (and, like pandas, boolean only when no value is missing).
+        """
+        df = df.copy()
+        for index, column in enumerate(self._columns):
+            if self.values[index] == 0 or self.numbers[index] == self.values[index]:
+                df[column] = pd.to_numeric(df[column])
+            elif self.booleans[index] == self.values[index] == self.rows:
+                df[column] = df[column].map(lambda value: value in ("True", "TRUE", "true"))
+        return df
+
+
+def sample_rows(file, dialect, columns, size=SAMPLE_SIZE, seed=None):
+    """
+    Draws a uniform sample of the rows of a whole CSV file, with a reservoir
+    filled while the file is read in chunks, so that memory usage does not
+    depend on the file size. The sample columns get the types of the whole
+    file, eg. a column of numbers that has a text value further down the
+    file is a column of texts. The number of rows of the whole file is kept
+    in `sample.attrs["rows"]` and the dtypes of its columns in
+    `sample.attrs["dtypes"]`.
+
+    Parameters
+    ----------
+    file : IO
+        A seekable binary file.
+    dialect : dict
+        The CSV dialect: sep, quotechar, header, encoding and compression.
+    columns : list
+        The column names.
+    size : int
+        Max number of rows of the sample. Default to `SAMPLE_SIZE`.
+    seed : int
+        Seed of the random generator. Default to None.
+
+    Returns
+    -------
+    pd.DataFrame
+        The sample, or None when the file could not be read.
+    """
+    rng = np.random.default_rng(seed)
+    stats = ColumnStats(columns)
+    reservoir = None
+    seen = 0
+
+    file.seek(0, SEEK_SET)
+    try:
+        chunks = pd.read_csv(
+            file,
+            header=0 if dialect["header"] else None,
+            names=columns,
+            sep=dialect["sep"],
+            quotechar=dialect["quotechar"],
+            encoding=dialect["encoding"],
+            compression=dialect["compression"],
+            dtype=str,
+            chunksize=SAMPLE_CHUNK_SIZE,
+        )
+        with chunks:
+            for chunk in chunks:
+                stats.update(chunk)
+                reservoir = _fill_reservoir(reservoir, chunk, seen, size, rng)
+                seen += len(chunk.index)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        logging.warning("Could not sample rows: %s", e)
+        return None
+    finally:
+        file.seek(0, SEEK_SET)
+
+    if reservoir is None:
+        return None
+    sample = stats.convert(reservoir.reset_index(drop=True))
+    sample.attrs["rows"] = stats.rows
+    sample.attrs["dtypes"] = stats.dtypes()
+    return sample
+
+
+def _fill_reservoir(reservoir, chunk, seen, size, rng):
+    """
+    Adds the rows of a chunk to a reservoir sample (algorithm R).
+
+    Parameters
+    ----------
+    reservoir : pd.DataFrame
+        The current sample, or None.
+    chunk : pd.DataFrame
+    seen : int
+        Number of rows read before the chunk.
+    size : int
+        Max number of rows of the sample.
+    rng : np.random.Generator
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    # the first rows fill the reservoir up
+    free = max(0, size - seen)
+    head, chunk = chunk.iloc[:free], chunk.iloc[free:]
+    if reservoir is None:
+        reservoir = head.copy()
+    elif len(head.index):
+        reservoir = pd.concat([reservoir, head])
+    seen += len(head.index)
+
+    if not len(chunk.index):
+        return reservoir
+
+    # then the n-th row replaces a random slot with probability size / n
+    slots = rng.integers(0, np.arange(seen, seen + len(chunk.index)) + 1)
+    replace = np.flatnonzero(slots < size)
+    if len(replace):
+        # when a slot is drawn twice in a chunk, the later row wins
+        slots, last = np.unique(slots[replace][::-1], return_index=True)
+        rows = replace[::-1][last]
+        reservoir.iloc[slots] = chunk.iloc[rows].to_numpy()
+    return reservoir
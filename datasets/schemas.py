@@ -1,3 +1,4 @@
+from os import SEEK_END, SEEK_SET
 from typing import Optional
 from fastapi import File, UploadFile, HTTPException
 from pydantic import BaseModel, validator
@@ -16,11 +17,14 @@ class FileUploadValidate(BaseModel):
         if not file:
             raise HTTPException(status_code=400, detail="File not exists")
 
-        contents = file.file.read()
-        if isinstance(len(contents), int) and len(contents) <= 0:
+        # measures the upload without reading it into memory
+        file.file.seek(0, SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0, SEEK_SET)
+        if size <= 0:
             raise HTTPException(status_code=400, detail="File content is empty or blank")
 
-        values["size"] = len(contents)
+        values["size"] = size
         values["name"] = file.filename
         return file
 
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""JSON encoding of dataset rows."""
+import json
+from json.encoder import encode_basestring
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# JSON has no NaN nor Infinity, so they are sent as texts
+NAN = '"NaN"'
+INF = '"Inf"'
+NEGATIVE_INF = '"-Inf"'
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class DatasetResponse(JSONResponse):
+    """
+    A JSON response for dataset details whose "data" is a DataFrame. The rows
+    are encoded column by column, straight from the numpy arrays, rather than
+    converted to lists of python objects first.
+    """
+
+    def render(self, content):
+        if not isinstance(content, dict) or not isinstance(content.get("data"), pd.DataFrame):
+            return super().render(content)
+
+        return ("{" + ",".join(_encode_members(content)) + "}").encode("utf-8")
+
+
+def dataset_response(func, *args, **kwargs):
+    """
+    Calls a function that returns dataset details and encodes them, so that
+    both run in the calling thread (eg. a worker pool rather than the event
+    loop).
+
+    Parameters
+    ----------
+    func : callable
+    *args, **kwargs
+        Passed to `func`.
+
+    Returns
+    -------
+    Response
+        A DatasetResponse, or the response `func` returned.
+    """
+    content = func(*args, **kwargs)
+    if isinstance(content, Response):
+        return content
+    return DatasetResponse(content)
+
+
+def stream_dataset(dataset, batches, media_type=JSON_MEDIA_TYPE):
+    """
+    Streams all rows of a dataset, encoding one batch of rows at a time.
+
+    As JSON, the body is the usual dataset details, with every row in data.
+    As NDJSON, every line of the body is a row.
+
+    Parameters
+    ----------
+    dataset : dict
+        The dataset details: name, filename and columns.
+    batches : iterable
+        The rows, as DataFrames.
+    media_type : str
+        `JSON_MEDIA_TYPE` or `NDJSON_MEDIA_TYPE`. Default to JSON.
+
+    Returns
+    -------
+    StreamingResponse
+    """
+    if media_type == NDJSON_MEDIA_TYPE:
+        content = _iter_ndjson(batches)
+    else:
+        content = _iter_json(dataset, batches)
+    return StreamingResponse(content, media_type=media_type)
+
+
+def _iter_json(dataset, batches):
+    """Encodes dataset details, then its rows batch by batch, as one JSON document."""
+    members = _encode_members(dataset)
+    yield ("{" + "".join(f"{member}," for member in members) + '"data":[').encode("utf-8")
+
+    total = 0
+    for batch in batches:
+        rows = encode_row_list(batch)
+        if rows:
+            separator = "," if total else ""
+            yield (separator + ",".join(rows)).encode("utf-8")
+            total += len(rows)
+
+    yield f'],"total":{total}}}'.encode("utf-8")
+
+
+def _iter_ndjson(batches):
+    """Encodes rows batch by batch, one JSON array per line."""
+    for batch in batches:
+        rows = encode_row_list(batch)
+        if rows:
+            yield ("\n".join(rows) + "\n").encode("utf-8")
+
+
+def _encode_members(content):
+    """Encodes the members of a JSON object, rows included."""
+    members = []
+    for key, value in content.items():
+        if isinstance(value, pd.DataFrame):
+            encoded = encode_rows(value)
+        else:
+            encoded = _dumps(value)
+        members.append(f"{_dumps(key)}:{encoded}")
+    return members
+
+
+def encode_rows(df):
+    """
+    Encodes the rows of a DataFrame as a JSON array of arrays. NaN, Inf and
+    -Inf are encoded as the texts "NaN", "Inf" and "-Inf".
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+
+    Returns
+    -------
+    str
+    """
+    return "[" + ",".join(encode_row_list(df)) + "]"
+
+
+def encode_row_list(df):
+    """
+    Encodes every row of a DataFrame as a JSON array.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+
+    Returns
+    -------
+    list
+        The encoded rows.
+    """
+    if not len(df.columns):
+        return ["[]"] * len(df.index)
+
+    columns = [encode_column(df.iloc[:, index]) for index in range(len(df.columns))]
+    return [f"[{','.join(row)}]" for row in zip(*columns)]
+
+
+def encode_column(series):
+    """
+    Encodes every value of a column as JSON.
+
+    Parameters
+    ----------
+    series : pd.Series
+
+    Returns
+    -------
+    list
+        The encoded values.
+    """
+    values = series.to_numpy()
+    kind = values.dtype.kind
+
+    if kind == "f":
+        # numpy formats floats with the shortest repr, like json does
+        values = values.astype(np.float64)
+        cells = np.where(np.isnan(values), NAN, values.astype(str))
+        cells = np.where(values == np.inf, INF, cells)
+        cells = np.where(values == -np.inf, NEGATIVE_INF, cells)
+        return cells.tolist()
+
+    if kind in "iu":
+        return values.astype(str).tolist()
+
+    if kind == "b":
+        return np.where(values, "true", "false").tolist()
+
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    return [
+        NAN if is_missing else _encode_value(value)
+        for value, is_missing in zip(values.tolist(), missing.tolist())
+    ]
+
+
+def _encode_value(value):
+    """Encodes a value of a column of python objects."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if isinstance(value, float):
+        if value == np.inf:
+            return INF
+        if value == -np.inf:
+            return NEGATIVE_INF
+    if hasattr(value, "isoformat"):
+        return encode_basestring(value.isoformat())
+    return _dumps(value)
+
+
+def _dumps(value):
+    """Encodes a value the way JSONResponse does."""
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=str,
+    )
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Coalescing of concurrent loads of the same resource."""
+import threading
+
+from datasets import metrics
+
+
+class _Call:
+    """A load in flight, and its outcome once done."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs a single load per key at a time: callers that ask for a key while
+    it is being loaded wait for that load and share its result (or error),
+    so storage reads and parsing scale with distinct keys rather than with
+    concurrent requests.
+
+    Parameters
+    ----------
+    name : str
+        A name for the loads, used as a label in metrics.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Calls `func(*args, **kwargs)`, or waits for the call in flight for
+        the same key.
+
+        Parameters
+        ----------
+        key : hashable
+        func : callable
+        *args, **kwargs
+            Passed to `func`.
+
+        Returns
+        -------
+        The value returned by `func`, shared by every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            metrics.increment("singleflight_shared_total", flight=self._name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
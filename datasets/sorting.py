@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Sort permutations of dataset rows."""
+import numpy as np
+import pandas as pd
+from platiagro.featuretypes import DATETIME, NUMERICAL
+
+
+def sort_permutation(series, featuretype, ascending=True):
+    """
+    Computes the positions of the rows of a dataset sorted by a column.
+
+    Values are compared by the featuretype of the column: as numbers for
+    Numerical columns, as dates for DateTime columns and as texts for
+    Categorical columns. Missing values, and values that do not fit the
+    featuretype, come last in either order. Rows with equal values keep
+    their order.
+
+    Parameters
+    ----------
+    series : pd.Series
+        The sort column.
+    featuretype : str
+    ascending : bool
+        Default to True.
+
+    Returns
+    -------
+    np.ndarray
+        The row positions, read-only so that it may be shared.
+    """
+    if featuretype == NUMERICAL:
+        keys = pd.to_numeric(series, errors="coerce")
+    elif featuretype == DATETIME:
+        keys = pd.to_datetime(series, errors="coerce")
+    else:
+        keys = series.astype(str).where(series.notna())
+
+    keys = keys.reset_index(drop=True)
+    order = keys.sort_values(ascending=ascending, na_position="last", kind="stable")
+    positions = order.index.to_numpy(dtype=np.int64)
+    positions.flags.writeable = False
+    return positions
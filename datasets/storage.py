@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Object storage access for the objects the PlatIAgro SDK does not manage.
+
+Datasets themselves are always written through the SDK, this module reuses
+its MinIO client and bucket.
+"""
+import io
+import json
+from io import BytesIO
+from os import SEEK_CUR, SEEK_END, SEEK_SET
+
+from minio.error import S3Error
+from platiagro.util import BUCKET_NAME, MINIO_CLIENT
+
+NOT_FOUND_CODES = ("NoSuchKey", "NoSuchBucket")
+DATASETS_PREFIX = "datasets"
+
+
+class RangeReader(io.RawIOBase):
+    """
+    A read-only file object over a stored object, that fetches every read
+    with a byte range request. Lets readers such as pyarrow fetch only the
+    parts of an object they need, or stream it without downloading it whole.
+
+    Parameters
+    ----------
+    object_name : str
+    size : int
+        The object size in bytes.
+    """
+
+    def __init__(self, object_name, size):
+        super().__init__()
+        self._object_name = object_name
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=SEEK_SET):
+        if whence == SEEK_CUR:
+            offset += self._position
+        elif whence == SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        remaining = self._size - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+
+        data = get_bytes(self._object_name, self._position, size)
+        self._position += len(data)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def dataset_object_name(name):
+    """
+    The object where the SDK stores the content of a dataset.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+
+    Returns
+    -------
+    str
+    """
+    return f"{DATASETS_PREFIX}/{name}/{name}"
+
+
+def sidecar_object_name(name, extension):
+    """
+    An object stored next to a dataset, such as its row index.
+
+    Parameters
+    ----------
+    name : str
+        The dataset name.
+    extension : str
+
+    Returns
+    -------
+    str
+    """
+    return f"{dataset_object_name(name)}.{extension}"
+
+
+def list_dataset_names(prefix=""):
+    """
+    Lists the names of the datasets that start with a prefix, with a single
+    listing of the object storage.
+
+    Parameters
+    ----------
+    prefix : str
+        Default to "" (every dataset).
+
+    Returns
+    -------
+    list
+    """
+    objects = MINIO_CLIENT.list_objects(
+        bucket_name=BUCKET_NAME,
+        prefix=f"{DATASETS_PREFIX}/{prefix}",
+    )
+    start = len(DATASETS_PREFIX) + 1
+    return [obj.object_name[start:].rstrip("/") for obj in objects if obj.is_dir]
+
+
+def list_dataset_objects():
+    """
+    Lists the stored content of every dataset, with a single recursive
+    listing of the object storage.
+
+    Returns
+    -------
+    dict
+        The size and the ISO 8601 time of last modification of each
+        dataset content, by dataset name.
+    """
+    objects = MINIO_CLIENT.list_objects(
+        bucket_name=BUCKET_NAME,
+        prefix=f"{DATASETS_PREFIX}/",
+        recursive=True,
+    )
+    start = len(DATASETS_PREFIX) + 1
+    contents = {}
+    for obj in objects:
+        name = obj.object_name[start:].split("/", 1)[0]
+        if obj.object_name == dataset_object_name(name):
+            contents[name] = {
+                "size": obj.size,
+                "lastModified": obj.last_modified.isoformat() if obj.last_modified else None,
+            }
+    return contents
+
+
+def list_objects(prefix):
+    """
+    Lists the objects that start with a prefix, with a single recursive
+    listing of the object storage.
+
+    Parameters
+    ----------
+    prefix : str
+
+    Returns
+    -------
+    dict
+        The time of last modification of each object, by object name.
+    """
+    objects = MINIO_CLIENT.list_objects(
+        bucket_name=BUCKET_NAME,
+        prefix=prefix,
+        recursive=True,
+    )
+    return {obj.object_name: obj.last_modified for obj in objects}
+
+
+def remove(object_name):
+    """
+    Removes an object.
+
+    Parameters
+    ----------
+    object_name : str
+    """
+    MINIO_CLIENT.remove_object(bucket_name=BUCKET_NAME, object_name=object_name)
+
+
+def put_json(object_name, content):
+    """
+    Stores a JSON document.
+
+    Parameters
+    ----------
+    object_name : str
+    content : dict
+    """
+    data = json.dumps(content).encode()
+    MINIO_CLIENT.put_object(
+        bucket_name=BUCKET_NAME,
+        object_name=object_name,
+        data=BytesIO(data),
+        length=len(data),
+        content_type="application/json",
+    )
+
+
+def put_file(object_name, file, length, content_type="application/octet-stream"):
+    """
+    Stores the content of a binary file.
+
+    Parameters
+    ----------
+    object_name : str
+    file : IO
+        A binary file, positioned at the start of the content.
+    length : int
+        The content size in bytes.
+    content_type : str
+        Default to "application/octet-stream".
+    """
+    MINIO_CLIENT.put_object(
+        bucket_name=BUCKET_NAME,
+        object_name=object_name,
+        data=file,
+        length=length,
+        content_type=content_type,
+    )
+
+
+def stat_object(object_name):
+    """
+    Reads the details of an object, without its content.
+
+    Parameters
+    ----------
+    object_name : str
+
+    Returns
+    -------
+    dict
+        The object size, ETag and ISO 8601 time of last modification.
+
+    Raises
+    ------
+    FileNotFoundError
+        When the object does not exist.
+    """
+    try:
+        obj = MINIO_CLIENT.stat_object(bucket_name=BUCKET_NAME, object_name=object_name)
+    except S3Error as e:
+        if e.code in NOT_FOUND_CODES:
+            raise FileNotFoundError(f"The specified object does not exist: {object_name}")
+        raise
+
+    return {
+        "size": obj.size,
+        "etag": obj.etag,
+        "lastModified": obj.last_modified.isoformat() if obj.last_modified else None,
+    }
+
+
+def get_json(object_name):
+    """
+    Reads a JSON document.
+
+    Parameters
+    ----------
+    object_name : str
+
+    Returns
+    -------
+    dict
+
+    Raises
+    ------
+    FileNotFoundError
+        When the object does not exist.
+    """
+    return json.loads(get_bytes(object_name))
+
+
+def get_bytes(object_name, offset=0, length=None):
+    """
+    Reads a whole object, or a byte range of it.
+
+    Parameters
+    ----------
+    object_name : str
+    offset : int
+        The first byte to read. Default to 0.
+    length : int
+        Number of bytes to read. Default to None (up to the end).
+
+    Returns
+    -------
+    bytes
+
+    Raises
+    ------
+    FileNotFoundError
+        When the object does not exist.
+    """
+    try:
+        response = MINIO_CLIENT.get_object(
+            bucket_name=BUCKET_NAME,
+            object_name=object_name,
+            offset=offset,
+            length=length or 0,
+        )
+    except S3Error as e:
+        if e.code in NOT_FOUND_CODES:
+            raise FileNotFoundError(f"The specified object does not exist: {object_name}")
+        raise
+
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
@@ -6,3 +6,6 @@ import pytest
 @pytest.hookimpl(tryfirst=True)
 def pytest_load_initial_conftests(args, early_config, parser):
     os.environ["ENABLE_CORS"] = "1"
+    # tests mock the storage with different metadata for the same datasets
+    os.environ["METADATA_CACHE_TTL"] = "0"
+    os.environ["CATALOG_PATH"] = ":memory:"
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import io
+import os
 import unittest
 import unittest.mock as mock
+from datetime import datetime, timedelta, timezone
 
 from fastapi.testclient import TestClient
 
+from datasets import metrics
 from datasets.api import app
+from datasets.exceptions import BadRequest
 
 import tests.util as util
 
@@ -15,6 +19,30 @@ TEST_CLIENT = TestClient(app)
 class TestCreateDataset(unittest.TestCase):
     maxDiff = None
 
+    def setUp(self):
+        patcher = mock.patch("datasets.storage.put_json")
+        self.mock_put_json = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("datasets.storage.put_file")
+        self.mock_put_file = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("datasets.storage.list_dataset_names", return_value=[])
+        self.mock_list_dataset_names = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("datasets.storage.remove")
+        self.mock_remove = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("datasets.storage.list_objects", return_value={})
+        self.mock_list_objects = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -22,7 +50,9 @@ class TestCreateDataset(unittest.TestCase):
     @mock.patch(
         "datasets.datasets.save_dataset",
     )
-    def test_create_dataset_with_iris_csv(self, mock_save_dataset, mock_stat_dataset):
+    def test_create_dataset_with_iris_csv(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
         """
         Should call platiagro.save_dataset using given file, filename, and metadata
         (columns, featurestypes, total, original-filename).
@@ -54,14 +84,27 @@ class TestCreateDataset(unittest.TestCase):
         mock_save_dataset.assert_any_call(
             dataset_name,
             mock.ANY,
+            metadata={"original-filename": util.IRIS_DATASET_NAME},
+        )
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
             metadata={
                 "columns": util.IRIS_COLUMNS,
                 "featuretypes": util.IRIS_FEATURETYPES,
-                "original-filename": util.IRIS_DATASET_NAME,
                 "total": len(util.IRIS_DATA_ARRAY),
+                "original-filename": util.IRIS_DATASET_NAME,
+                "size": mock.ANY,
+                "sha256": mock.ANY,
+                "index": {"stride": 1024},
+                "columnar": mock.ANY,
+                "dialect": util.IRIS_DIALECT,
+                "dtypes": util.IRIS_DTYPES,
             },
         )
 
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -70,7 +113,7 @@ class TestCreateDataset(unittest.TestCase):
         "datasets.datasets.save_dataset",
     )
     def test_create_dataset_with_iris_csv_one_column(
-        self, mock_save_dataset, mock_stat_dataset
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
     ):
         """
         Should call platiagro.save_dataset using given file, filename, and metadata
@@ -103,14 +146,27 @@ class TestCreateDataset(unittest.TestCase):
         mock_save_dataset.assert_any_call(
             dataset_name,
             mock.ANY,
+            metadata={"original-filename": util.IRIS_DATASET_NAME},
+        )
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
             metadata={
                 "columns": util.IRIS_ONE_COLUMN,
                 "featuretypes": util.IRIS_FEATURETYPES_ONE_COLUMN,
-                "original-filename": util.IRIS_DATASET_NAME,
                 "total": len(util.IRIS_DATA_ARRAY_ONE_COLUMN),
+                "original-filename": util.IRIS_DATASET_NAME,
+                "size": mock.ANY,
+                "sha256": mock.ANY,
+                "index": {"stride": 1024},
+                "columnar": mock.ANY,
+                "dialect": mock.ANY,
+                "dtypes": util.IRIS_DTYPES[:1],
             },
         )
 
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -119,7 +175,7 @@ class TestCreateDataset(unittest.TestCase):
         "datasets.datasets.save_dataset",
     )
     def test_create_dataset_with_iris_csv_headerless(
-        self, mock_save_dataset, mock_stat_dataset
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
     ):
         """
         Should call platiagro.save_dataset using given:
@@ -152,14 +208,27 @@ class TestCreateDataset(unittest.TestCase):
         mock_save_dataset.assert_any_call(
             dataset_name,
             mock.ANY,
+            metadata={"original-filename": util.IRIS_DATASET_NAME},
+        )
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
             metadata={
                 "columns": util.IRIS_HEADERLESS_COLUMNS,
                 "featuretypes": util.IRIS_FEATURETYPES,
-                "original-filename": util.IRIS_DATASET_NAME,
                 "total": len(util.IRIS_DATA_ARRAY),
+                "original-filename": util.IRIS_DATASET_NAME,
+                "size": mock.ANY,
+                "sha256": mock.ANY,
+                "index": {"stride": 1024},
+                "columnar": mock.ANY,
+                "dialect": util.IRIS_DIALECT_HEADERLESS,
+                "dtypes": util.IRIS_DTYPES,
             },
         )
 
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -167,7 +236,9 @@ class TestCreateDataset(unittest.TestCase):
     @mock.patch(
         "datasets.datasets.save_dataset",
     )
-    def test_create_dataset_with_png(self, mock_save_dataset, mock_stat_dataset):
+    def test_create_dataset_with_png(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
         """
         Should call platiagro.save_dataset using given file, filename, and metadata (original-filename).
         """
@@ -199,6 +270,92 @@ class TestCreateDataset(unittest.TestCase):
                 "original-filename": util.PNG_DATASET_NAME,
             },
         )
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
+            metadata={
+                "original-filename": util.PNG_DATASET_NAME,
+                "size": len(util.PNG_DATA),
+                "sha256": mock.ANY,
+            },
+        )
+
+    @mock.patch(
+        "datasets.jobs.EXECUTOR",
+    )
+    @mock.patch(
+        "datasets.jobs.storage.put_json",
+    )
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_async(
+        self,
+        mock_save_dataset,
+        mock_stat_dataset,
+        mock_update_dataset_metadata,
+        mock_put_json,
+        mock_executor,
+    ):
+        """
+        Should store the file and answer 202 with an ingest job, and remove
+        the details of expired jobs once it ends.
+        """
+        # runs the background job right away
+        mock_executor.submit.side_effect = lambda func, *args, **kwargs: func(
+            *args, **kwargs
+        )
+        dataset_name = util.IRIS_DATASET_NAME
+        now = datetime.now(timezone.utc)
+        self.mock_list_objects.return_value = {
+            "jobs/expired.json": now - timedelta(days=2),
+            "jobs/recent.json": now - timedelta(minutes=1),
+        }
+
+        rv = TEST_CLIENT.post(
+            "/datasets?async=true",
+            files={
+                "file": (
+                    dataset_name,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 202)
+        self.assertEqual(result["dataset"], dataset_name)
+        self.assertIn("id", result)
+        mock_save_dataset.assert_any_call(
+            dataset_name,
+            mock.ANY,
+            metadata={"original-filename": util.IRIS_DATASET_NAME},
+        )
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
+            metadata={
+                "columns": util.IRIS_COLUMNS,
+                "featuretypes": util.IRIS_FEATURETYPES,
+                "total": len(util.IRIS_DATA_ARRAY),
+                "original-filename": util.IRIS_DATASET_NAME,
+                "size": mock.ANY,
+                "sha256": mock.ANY,
+                "index": {"stride": 1024},
+                "columnar": mock.ANY,
+                "dialect": mock.ANY,
+                "dtypes": util.IRIS_DTYPES,
+            },
+        )
+        mock_put_json.assert_any_call(f"jobs/{result['id']}.json", mock.ANY)
+        self.mock_remove.assert_any_call("jobs/expired.json")
+        self.assertNotIn(mock.call("jobs/recent.json"), self.mock_remove.call_args_list)
 
     def test_create_dataset_with_gfile_client_unauthorized(self):
         """
@@ -250,6 +407,9 @@ class TestCreateDataset(unittest.TestCase):
         # self.assertEqual(result, expected)
         self.assertEqual(rv.status_code, 400)
 
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -258,7 +418,7 @@ class TestCreateDataset(unittest.TestCase):
         "datasets.datasets.save_dataset",
     )
     def test_create_dataset_with_predict_file_csv(
-        self, mock_save_dataset, mock_stat_dataset
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
     ):
         """
         Should call platiagro.save_dataset using given:
@@ -299,6 +459,9 @@ class TestCreateDataset(unittest.TestCase):
         #     },
         # )
 
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -307,7 +470,7 @@ class TestCreateDataset(unittest.TestCase):
         "datasets.datasets.save_dataset",
     )
     def test_create_dataset_with_predict_file_headerless_csv(
-        self, mock_save_dataset, mock_stat_dataset
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
     ):
         """
         Should call platiagro.save_dataset using given:
@@ -340,14 +503,27 @@ class TestCreateDataset(unittest.TestCase):
         mock_save_dataset.assert_any_call(
             dataset_name,
             mock.ANY,
+            metadata={"original-filename": util.PREDICT_HEADERLESS},
+        )
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
             metadata={
                 "columns": util.PREDICT_COLUMNS_HEADERLESS,
                 "featuretypes": util.PREDICT_FEATURETYPES,
-                "original-filename": util.PREDICT_HEADERLESS,
                 "total": len(util.PREDICT_FILE_DATA),
+                "original-filename": util.PREDICT_HEADERLESS,
+                "size": mock.ANY,
+                "sha256": mock.ANY,
+                "index": {"stride": 1024},
+                "columnar": mock.ANY,
+                "dialect": mock.ANY,
+                "dtypes": mock.ANY,
             },
         )
 
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -356,7 +532,7 @@ class TestCreateDataset(unittest.TestCase):
         "datasets.datasets.save_dataset",
     )
     def test_create_foul_dataset(
-        self, mock_save_dataset, mock_stat_dataset
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
     ):
         rv = TEST_CLIENT.post(
             "/datasets",
@@ -370,3 +546,423 @@ class TestCreateDataset(unittest.TestCase):
         )
         # self.assertEqual(rv.status_code, 500)
         self.assertEqual(rv.status_code, 400)
+
+    @mock.patch(
+        "datasets.retry.BASE_DELAY",
+        0,
+    )
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+        side_effect=[ConnectionError("Connection reset by peer"), None],
+    )
+    def test_create_dataset_retries_transient_errors(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should retry the upload when the object storage fails temporarily.
+        """
+        retries = metrics.get_value("retries_total", operation="upload")
+
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": (
+                    util.IRIS_DATASET_NAME,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(mock_save_dataset.call_count, 2)
+        self.assertEqual(
+            metrics.get_value("retries_total", operation="upload"), retries + 1
+        )
+
+    @mock.patch(
+        "datasets.retry.BASE_DELAY",
+        0,
+    )
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+        side_effect=[ConnectionError("Connection reset by peer"), None],
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_retries_under_the_same_name(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should store the whole file again under the reserved name when the upload fails after the dataset was stored.
+        """
+        contents = []
+        mock_save_dataset.side_effect = lambda name, reader, metadata: contents.append(reader.read())
+
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": (
+                    util.IRIS_DATASET_NAME,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["name"], util.IRIS_DATASET_NAME)
+        self.assertEqual(contents, [util.IRIS_DATA.encode()] * 2)
+        for call in mock_save_dataset.call_args_list:
+            self.assertEqual(call[0][0], util.IRIS_DATASET_NAME)
+        self.mock_put_json.assert_any_call(
+            f"datasets/{util.IRIS_DATASET_NAME}/{util.IRIS_DATASET_NAME}.reservation",
+            {"filename": util.IRIS_DATASET_NAME},
+        )
+        reservations = [
+            call for call in self.mock_put_json.call_args_list if call[0][0].endswith(".reservation")
+        ]
+        self.assertEqual(len(reservations), 1)
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+        side_effect=ValueError("Unexpected value"),
+    )
+    def test_create_dataset_does_not_retry_other_errors(
+        self, mock_save_dataset, mock_stat_dataset
+    ):
+        """
+        Should raise http status 500 without retrying errors that are not transient.
+        """
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": (
+                    util.IRIS_DATASET_NAME,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+        result = rv.json()
+
+        expected = {"message": "Not able to handle file upload"}
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 500)
+        self.assertEqual(mock_save_dataset.call_count, 1)
+
+    def test_create_dataset_without_filename(self):
+        """
+        Should raise http status 400 when the file has no filename, without
+        reserving a dataset name.
+        """
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={"file": ("", io.StringIO(util.IRIS_DATA), "multipart/form-data")},
+        )
+        result = rv.json()
+
+        expected = {"message": "No selected file."}
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 400)
+        self.mock_list_dataset_names.assert_not_called()
+        self.mock_put_json.assert_not_called()
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+        side_effect=BadRequest("InvalidFile", "The file is invalid."),
+    )
+    def test_create_dataset_reports_upload_error_when_release_fails(
+        self, mock_save_dataset, mock_stat_dataset
+    ):
+        """
+        Should report the error of the upload, not the one of releasing the
+        reserved dataset name.
+        """
+        self.mock_remove.side_effect = ConnectionError("Connection refused")
+
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": (
+                    util.IRIS_DATASET_NAME,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+        result = rv.json()
+
+        expected = {"message": "The file is invalid."}
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 400)
+        self.mock_remove.assert_called_once_with(
+            f"datasets/{util.IRIS_DATASET_NAME}/{util.IRIS_DATASET_NAME}.reservation"
+        )
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_counts_every_row(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should store the number of rows of the whole file, not of the preview.
+        """
+        dataset_name = util.TITANIC_DATASET_NAME
+
+        with open(f"samples/{dataset_name}", "rb") as file:
+            rv = TEST_CLIENT.post(
+                "/datasets",
+                files={"file": (dataset_name, file, "multipart/form-data")},
+            )
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["total"], util.TITANIC_TOTAL)
+        self.assertEqual(len(result["data"]), 100)
+        metadata = mock_update_dataset_metadata.call_args[1]["metadata"]
+        self.assertEqual(metadata["total"], util.TITANIC_TOTAL)
+        self.assertEqual(
+            metadata["size"], os.path.getsize(f"samples/{dataset_name}")
+        )
+        self.assertEqual(metadata["index"], {"stride": 1024})
+        self.assertEqual(metadata["columnar"]["format"], "parquet")
+        self.assertEqual(metadata["columnar"]["rows"], util.TITANIC_TOTAL)
+        self.mock_put_file.assert_any_call(
+            f"datasets/{dataset_name}/{dataset_name}.parquet",
+            mock.ANY,
+            metadata["columnar"]["size"],
+        )
+
+        index = self.mock_put_json.call_args[0][1]
+        self.mock_put_json.assert_any_call(
+            f"datasets/{dataset_name}/{dataset_name}.index", index
+        )
+        self.assertEqual(len(index["offsets"]), util.TITANIC_TOTAL // 1024 + 1)
+        self.assertTrue(index["header"])
+        self.assertEqual(index["sep"], ",")
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_counts_rows_with_line_breaks_in_quotes(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should not count the line breaks inside quoted fields, whatever the quote character.
+        """
+        for quotechar in ['"', "'"]:
+            rows = [f"{i},{quotechar}first line\nsecond line{quotechar}\n" for i in range(300)]
+            data = f"{quotechar}id{quotechar},{quotechar}text{quotechar}\n" + "".join(rows)
+
+            rv = TEST_CLIENT.post(
+                "/datasets",
+                files={
+                    "file": ("quoted.csv", io.StringIO(data), "multipart/form-data")
+                },
+            )
+            result = rv.json()
+
+            self.assertEqual(rv.status_code, 200, quotechar)
+            self.assertEqual(result["total"], 300, quotechar)
+            metadata = mock_update_dataset_metadata.call_args[1]["metadata"]
+            self.assertEqual(metadata["total"], 300, quotechar)
+            self.assertEqual(metadata["dialect"]["quotechar"], quotechar)
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_counts_rows_of_irregular_files(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should count every row of files with stray quotes, carriage return line endings or a UTF-16 encoding,
+        and not index them.
+        """
+        stray_quote = "id,product\n" + "".join(f'{i},TV {i}" screen\n' for i in range(2999))
+        carriage_returns = "a,b\r" + "".join(f"{i},{i}\r" for i in range(300))
+        utf16 = ("a,b\n" + "".join(f"{i},{i}\n" for i in range(300))).encode("utf-16")
+
+        for filename, data, total in [
+            ("stray-quote.csv", stray_quote.encode(), 2999),
+            ("carriage-returns.csv", carriage_returns.encode(), 300),
+            ("utf16.csv", utf16, 300),
+        ]:
+            rv = TEST_CLIENT.post(
+                "/datasets",
+                files={"file": (filename, io.BytesIO(data), "multipart/form-data")},
+            )
+            result = rv.json()
+
+            self.assertEqual(rv.status_code, 200, filename)
+            self.assertEqual(result["total"], total, filename)
+            metadata = mock_update_dataset_metadata.call_args[1]["metadata"]
+            self.assertEqual(metadata["total"], total, filename)
+            # their records were miscounted while they were stored
+            self.assertNotIn("index", metadata, filename)
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_records_stage_timings(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should record the duration of every ingest stage.
+        """
+        stages = ["store", "encoding", "dialect", "preview", "featuretypes", "metadata"]
+        counts = [
+            metrics.get_value("ingest_stage_seconds_count", stage=stage)
+            for stage in stages
+        ]
+
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": (
+                    util.IRIS_DATASET_NAME,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+
+        self.assertEqual(rv.status_code, 200)
+        for stage, count in zip(stages, counts):
+            self.assertEqual(
+                metrics.get_value("ingest_stage_seconds_count", stage=stage),
+                count + 1,
+            )
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_infers_featuretypes_from_whole_file(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should infer featuretypes from a sample of the whole file, not from its first rows.
+        """
+        rows = [f"{i},{i}\n" for i in range(200)] + ["200,unknown\n"]
+        data = "id,value\n" + "".join(rows)
+
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": ("sorted.csv", io.StringIO(data), "multipart/form-data")
+            },
+        )
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(
+            result["columns"],
+            [
+                {"name": "id", "featuretype": "Numerical"},
+                {"name": "value", "featuretype": "Categorical"},
+            ],
+        )
+        metadata = mock_update_dataset_metadata.call_args[1]["metadata"]
+        self.assertEqual(metadata["featuretypes"], ["Numerical", "Categorical"])
+
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    @mock.patch(
+        "datasets.datasets.save_dataset",
+    )
+    def test_create_dataset_with_name_in_use(
+        self, mock_save_dataset, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should pick the next free name from a single listing and reserve it while the dataset is stored.
+        """
+        self.mock_list_dataset_names.return_value = [
+            "iris.csv",
+            "iris-2.csv",
+            "iris-3.csv",
+            "iris-data.csv",
+        ]
+
+        rv = TEST_CLIENT.post(
+            "/datasets",
+            files={
+                "file": (
+                    util.IRIS_DATASET_NAME,
+                    io.StringIO(util.IRIS_DATA),
+                    "multipart/form-data",
+                )
+            },
+        )
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["name"], "iris-4.csv")
+        self.mock_list_dataset_names.assert_called_once_with(prefix="iris")
+        mock_stat_dataset.assert_called_once_with("iris-4.csv")
+        self.mock_put_json.assert_any_call(
+            "datasets/iris-4.csv/iris-4.csv.reservation", {"filename": util.IRIS_DATASET_NAME}
+        )
+        self.mock_remove.assert_called_once_with("datasets/iris-4.csv/iris-4.csv.reservation")
+        mock_save_dataset.assert_any_call("iris-4.csv", mock.ANY, metadata=mock.ANY)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import codecs
+import gzip
+import unittest
+from io import BytesIO
+
+from datasets.dialect import ENCODING_HEAD_SIZE, ENCODING_SAMPLE_SIZE, detect_encoding
+
+LATIN1_TEXT = (
+    "região,produção,irrigação,observação\n"
+    "São Paulo,café,média,colheita não começou\n"
+    "Paraná,soja,baixa,época de plantação\n"
+    "Goiás,milho,alta,previsão de geada à noite\n"
+) * 20
+
+
+class TestDetectEncoding(unittest.TestCase):
+
+    def test_detect_encoding_byte_order_marks(self):
+        """
+        Should detect the encoding from a byte order mark.
+        """
+        for bom, encoding in [
+            (codecs.BOM_UTF8, "utf-8-sig"),
+            (codecs.BOM_UTF16_LE, "utf-16"),
+            (codecs.BOM_UTF16_BE, "utf-16"),
+            (codecs.BOM_UTF32_LE, "utf-32"),
+        ]:
+            file = BytesIO(bom + "a,b\n1,2\n".encode(encoding.replace("-sig", "")))
+            self.assertEqual(detect_encoding(file), encoding, bom)
+            self.assertEqual(file.tell(), 0)
+
+    def test_detect_encoding_binary_file(self):
+        """
+        Should return None for files with NUL bytes.
+        """
+        self.assertIsNone(detect_encoding(BytesIO(b"PK\x03\x04\x00\x00\x08\x00")))
+        self.assertIsNone(detect_encoding(BytesIO(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR")))
+
+    def test_detect_encoding_single_line(self):
+        """
+        Should detect the encoding of files with a single line, with or
+        without a line break.
+        """
+        self.assertEqual(detect_encoding(BytesIO(b"a,b,c")), "utf-8")
+        self.assertEqual(detect_encoding(BytesIO("região,café\n".encode())), "utf-8")
+        self.assertEqual(detect_encoding(BytesIO(b"")), "utf-8")
+
+    def test_detect_encoding_latin1(self):
+        """
+        Should fall back to chardet when the file is not valid UTF-8.
+        """
+        file = BytesIO(LATIN1_TEXT.encode("latin-1"))
+
+        encoding = detect_encoding(file)
+
+        self.assertIn(encoding.lower(), ["iso-8859-1", "windows-1252"])
+        self.assertEqual(file.getvalue().decode(encoding), LATIN1_TEXT)
+
+    def test_detect_encoding_compressed(self):
+        """
+        Should detect the encoding of the decompressed content, and return
+        None when it can't be decompressed.
+        """
+        file = BytesIO(gzip.compress("região,café\n".encode()))
+        self.assertEqual(detect_encoding(file, compression="gzip"), "utf-8")
+
+        file = BytesIO(b"not gzip")
+        self.assertIsNone(detect_encoding(file, compression="gzip"))
+
+    def test_detect_encoding_samples_middle_and_tail(self):
+        """
+        Should sample the middle and the tail of large files, not only their
+        head.
+        """
+        head = b"a,b\n" * (ENCODING_HEAD_SIZE // 4)
+        padding = b"1,2\n" * (2 * ENCODING_SAMPLE_SIZE)
+
+        # non ascii characters only in the middle
+        file = BytesIO(head + padding + "região,café\n".encode() * 200 + padding)
+        self.assertEqual(detect_encoding(file), "utf-8")
+
+        # latin-1 only in the tail
+        file = BytesIO(head + padding + LATIN1_TEXT.encode("latin-1"))
+        self.assertNotEqual(detect_encoding(file), "utf-8")
+
+        # NUL bytes only in the tail
+        file = BytesIO(head + padding + b"\x00" * 16)
+        self.assertIsNone(detect_encoding(file))
+
+    def test_detect_encoding_characters_cut_by_samples(self):
+        """
+        Should ignore UTF-8 characters cut at the boundaries of the samples.
+        """
+        content = "ção,".encode() * (3 * ENCODING_HEAD_SIZE)
+        for offset in range(4):
+            # shifts the boundaries of the middle and tail samples
+            file = BytesIO(b"a" * offset + content)
+            self.assertEqual(detect_encoding(file), "utf-8", offset)
@@ -1,10 +1,22 @@
 # -*- coding: utf-8 -*-
+import json
+import threading
+import time
 import unittest
 import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+import pandas as pd
 from fastapi.testclient import TestClient
 
+from datasets import metrics
 from datasets.api import app
+from datasets.cache import DATASET_CACHE
+from datasets.datasets import STREAM_BATCH_SIZE, get_dataset
+from datasets.dialect import read_csv
+from datasets.ingest import RowCounter
+from datasets.readers import build_index
 
 import tests.util as util
 
@@ -12,6 +24,12 @@ TEST_CLIENT = TestClient(app)
 
 
 class TestGetDataset(unittest.TestCase):
+    def setUp(self):
+        # datasets without a checksum are versioned by the ETag of their content
+        patcher = mock.patch("datasets.storage.stat_object", side_effect=util.FILE_NOT_FOUND_ERROR)
+        self.mock_stat_object = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -219,3 +237,794 @@ class TestGetDataset(unittest.TestCase):
 
         rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=-42&page_size=2")
         self.assertEqual(rv.status_code, 404)
+
+    @mock.patch(
+        "datasets.readers.storage.get_bytes",
+        side_effect=lambda object_name, offset, length: util.IRIS_DATA.encode()[
+            offset:offset + length if length else None
+        ],
+    )
+    @mock.patch(
+        "datasets.readers.storage.get_json",
+        return_value=util.IRIS_INDEX,
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "index": {"stride": 2},
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+    )
+    def test_get_dataset_iris_csv_with_index(
+        self, mock_load_dataset, mock_stat_dataset, mock_get_json, mock_get_bytes
+    ):
+        """
+        Should read only the bytes of the requested page when the dataset has a row index.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=2&page_size=2")
+        result = rv.json()
+
+        expected = {
+            "columns": util.IRIS_COLUMNS_FEATURETYPES,
+            "data": util.IRIS_DATA_ARRAY[2:4],
+            "filename": util.IRIS_DATASET_NAME,
+            "name": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        }
+        self.assertEqual(expected, result)
+        self.assertEqual(rv.status_code, 200)
+        mock_get_json.assert_any_call(f"datasets/{dataset_name}/{dataset_name}.index")
+        mock_get_bytes.assert_any_call(
+            f"datasets/{dataset_name}/{dataset_name}", 90, None
+        )
+        mock_load_dataset.assert_not_called()
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=2")
+        result = rv.json()
+
+        self.assertEqual(result["data"], util.IRIS_DATA_ARRAY[:2])
+        mock_get_bytes.assert_any_call(
+            f"datasets/{dataset_name}/{dataset_name}", 62, 84
+        )
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=3&page_size=2")
+        self.assertEqual(rv.status_code, 404)
+
+    def test_get_dataset_with_index_keeps_the_dtypes_of_the_whole_file(self):
+        """
+        Should parse every page read through the row index with the dtypes of the whole file.
+        """
+        data = ("id,code\n" + "".join(f"{i},{i}\n" for i in range(2999)) + "2999,oops\n").encode()
+        counter = RowCounter(index_stride=1024)
+        counter.update(data)
+        dialect = {"sep": ",", "quotechar": '"', "header": True, "encoding": "utf-8", "compression": None}
+        metadata = {
+            "columns": ["id", "code"],
+            "featuretypes": ["Numerical", "Categorical"],
+            "original-filename": "codes.csv",
+            "total": 3000,
+            "dtypes": ["int64", "object"],
+            "index": {"stride": 1024},
+        }
+
+        with mock.patch("datasets.datasets.stat_dataset", return_value=metadata), mock.patch(
+            "datasets.readers.storage.get_json", return_value=build_index(counter, dialect)
+        ), mock.patch(
+            "datasets.readers.storage.get_bytes",
+            side_effect=lambda object_name, offset=0, length=None: data[offset:offset + length if length else None],
+        ):
+            rv = TEST_CLIENT.get("/datasets/codes.csv?page=1&page_size=2")
+            self.assertEqual(rv.json()["data"], [[0, "0"], [1, "1"]])
+
+            rv = TEST_CLIENT.get("/datasets/codes.csv?page=1500&page_size=2")
+            self.assertEqual(rv.json()["data"], [[2998, "2998"], [2999, "oops"]])
+
+    @mock.patch(
+        "datasets.columnar.storage.get_bytes",
+        side_effect=lambda object_name, offset=0, length=None: util.IRIS_PARQUET[
+            offset:offset + length if length else None
+        ],
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "columnar": {
+                "format": "parquet",
+                "size": len(util.IRIS_PARQUET),
+                "rows": len(util.IRIS_DATA_ARRAY),
+            },
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+    )
+    def test_get_dataset_iris_csv_with_columnar_copy(
+        self, mock_load_dataset, mock_stat_dataset, mock_get_bytes
+    ):
+        """
+        Should read the dataset contents from its columnar copy.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=2&page_size=2")
+        result = rv.json()
+
+        expected = {
+            "columns": util.IRIS_COLUMNS_FEATURETYPES,
+            "data": util.IRIS_DATA_ARRAY[2:4],
+            "filename": util.IRIS_DATASET_NAME,
+            "name": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        }
+        self.assertEqual(expected, result)
+        self.assertEqual(rv.status_code, 200)
+        mock_get_bytes.assert_any_call(
+            f"datasets/{dataset_name}/{dataset_name}.parquet", mock.ANY, mock.ANY
+        )
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=-1")
+        result = rv.json()
+
+        self.assertEqual(result["data"], util.IRIS_DATA_ARRAY)
+        mock_load_dataset.assert_not_called()
+
+    @mock.patch(
+        "datasets.readers.storage.get_bytes",
+        return_value=util.IRIS_DATA.encode(),
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "dialect": util.IRIS_DIALECT,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+    )
+    def test_get_dataset_iris_csv_with_dialect(
+        self, mock_load_dataset, mock_stat_dataset, mock_get_bytes
+    ):
+        """
+        Should parse the dataset with the dialect detected at ingest.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=-1")
+        result = rv.json()
+
+        expected = {
+            "columns": util.IRIS_COLUMNS_FEATURETYPES,
+            "data": util.IRIS_DATA_ARRAY,
+            "filename": util.IRIS_DATASET_NAME,
+            "name": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        }
+        self.assertEqual(expected, result)
+        self.assertEqual(rv.status_code, 200)
+        mock_get_bytes.assert_any_call(f"datasets/{dataset_name}/{dataset_name}")
+        mock_load_dataset.assert_not_called()
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": ["x", "label"],
+            "featuretypes": ["Numerical", "Categorical"],
+            "original-filename": "missing.csv",
+            "total": 4,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=pd.DataFrame(
+            {"x": [1.5, np.nan, np.inf, -np.inf], "label": ["a", None, "c", "d"]}
+        ),
+    )
+    def test_get_dataset_with_missing_and_infinite_values(
+        self, mock_load_dataset, mock_stat_dataset
+    ):
+        """
+        Should encode NaN, Inf and -Inf values as texts.
+        """
+        rv = TEST_CLIENT.get("/datasets/missing.csv")
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(
+            result["data"],
+            [[1.5, "a"], ["NaN", "NaN"], ["Inf", "c"], ["-Inf", "d"]],
+        )
+
+    @mock.patch(
+        "datasets.readers.storage.get_bytes",
+        side_effect=lambda object_name, offset=0, length=None: util.IRIS_DATA.encode()[
+            offset:offset + length if length else None
+        ],
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "size": len(util.IRIS_DATA.encode()),
+            "dialect": util.IRIS_DIALECT,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+    )
+    def test_get_dataset_iris_csv_with_page_size_minus1_as_ndjson(
+        self, mock_load_dataset, mock_stat_dataset, mock_get_bytes
+    ):
+        """
+        Should stream every row as a line of NDJSON when asked for.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.get(
+            f"/datasets/{dataset_name}?page_size=-1",
+            headers={"Accept": "application/x-ndjson"},
+        )
+        lines = rv.text.split("\n")
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.headers["content-type"], "application/x-ndjson")
+        self.assertEqual(lines[-1], "")
+        self.assertEqual([json.loads(line) for line in lines[:-1]], util.IRIS_DATA_ARRAY)
+        mock_get_bytes.assert_any_call(
+            f"datasets/{dataset_name}/{dataset_name}", 0, len(util.IRIS_DATA.encode())
+        )
+        mock_load_dataset.assert_not_called()
+
+    def test_get_dataset_as_ndjson_keeps_the_dtypes_of_the_whole_file(self):
+        """
+        Should parse every batch of a streamed dataset with the dtypes of the whole file.
+        """
+        total = STREAM_BATCH_SIZE + 1
+        data = ("id,code\n" + "".join(f"{i},{i}\n" for i in range(total - 1)) + f"{total - 1},oops\n").encode()
+        metadata = {
+            "columns": ["id", "code"],
+            "featuretypes": ["Numerical", "Categorical"],
+            "original-filename": "codes.csv",
+            "total": total,
+            "size": len(data),
+            "dialect": util.IRIS_DIALECT,
+            "dtypes": ["int64", "object"],
+        }
+
+        with mock.patch("datasets.datasets.stat_dataset", return_value=metadata), mock.patch(
+            "datasets.readers.storage.get_bytes",
+            side_effect=lambda object_name, offset=0, length=None: data[offset:offset + length if length else None],
+        ):
+            rv = TEST_CLIENT.get("/datasets/codes.csv?page_size=-1", headers={"Accept": "application/x-ndjson"})
+            rows = [json.loads(line) for line in rv.text.split("\n")[:-1]]
+
+        self.assertEqual(len(rows), total)
+        self.assertEqual(rows[0], [0, "0"])
+        self.assertEqual(rows[-1], [total - 1, "oops"])
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "sha256": "0" * 64,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=util.IRIS_DATAFRAME,
+    )
+    def test_get_dataset_iris_csv_pages_from_cache(
+        self, mock_load_dataset, mock_stat_dataset
+    ):
+        """
+        Should parse the dataset once and serve the following pages from memory.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+        DATASET_CACHE.clear()
+        hits = metrics.get_value("dataset_cache_hits_total")
+
+        for page in (1, 2, 1, 2):
+            rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page={page}&page_size=2")
+            result = rv.json()
+
+            self.assertEqual(rv.status_code, 200)
+            self.assertEqual(result["data"], util.IRIS_DATA_ARRAY[2 * page - 2:2 * page])
+
+        mock_load_dataset.assert_called_once_with(dataset_name)
+        self.assertEqual(metrics.get_value("dataset_cache_hits_total"), hits + 3)
+
+        DATASET_CACHE.invalidate(dataset_name)
+        TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=2")
+        self.assertEqual(mock_load_dataset.call_count, 2)
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=util.IRIS_DATAFRAME,
+    )
+    def test_get_dataset_without_checksum_pages_from_cache(
+        self, mock_load_dataset, mock_stat_dataset
+    ):
+        """
+        Should cache datasets ingested without a checksum by the ETag of their content.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+        DATASET_CACHE.clear()
+        self.mock_stat_object.side_effect = None
+        self.mock_stat_object.return_value = {"size": 100, "etag": "etag-v1", "lastModified": None}
+
+        for page in (1, 2):
+            rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page={page}&page_size=2")
+            result = rv.json()
+
+            self.assertEqual(rv.status_code, 200)
+            self.assertEqual(result["data"], util.IRIS_DATA_ARRAY[2 * page - 2:2 * page])
+
+        mock_load_dataset.assert_called_once_with(dataset_name)
+        self.mock_stat_object.assert_called_with(f"datasets/{dataset_name}/{dataset_name}")
+
+        # a new content is a new version
+        self.mock_stat_object.return_value = {"size": 100, "etag": "etag-v2", "lastModified": None}
+        TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=2")
+        self.assertEqual(mock_load_dataset.call_count, 2)
+        DATASET_CACHE.clear()
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+    )
+    def test_get_dataset_concurrent_requests_share_one_load(
+        self, mock_load_dataset, mock_stat_dataset
+    ):
+        """
+        Should load a dataset once for concurrent requests of the same dataset.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+        release = threading.Event()
+
+        def load(name):
+            release.wait(timeout=5)
+            return util.IRIS_DATAFRAME
+
+        mock_load_dataset.side_effect = load
+        shared = metrics.get_value("singleflight_shared_total", flight="datasets")
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [
+                pool.submit(get_dataset, dataset_name, page=1, page_size=2)
+                for _ in range(4)
+            ]
+            # waits for the other requests to join the first one
+            for _ in range(500):
+                if metrics.get_value("singleflight_shared_total", flight="datasets") == shared + 3:
+                    break
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+
+        for result in results:
+            self.assertEqual(result["data"].values.tolist(), util.IRIS_DATA_ARRAY[:2])
+        mock_load_dataset.assert_called_once_with(dataset_name)
+
+    @mock.patch(
+        "datasets.columnar.storage.get_bytes",
+        side_effect=lambda object_name, offset=0, length=None: util.IRIS_PARQUET[
+            offset:offset + length if length else None
+        ],
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "sha256": "1" * 64,
+            "columnar": {
+                "format": "parquet",
+                "size": len(util.IRIS_PARQUET),
+                "rows": len(util.IRIS_DATA_ARRAY),
+            },
+        },
+    )
+    def test_get_dataset_iris_csv_pages_of_columnar_copy_from_cache(
+        self, mock_stat_dataset, mock_get_bytes
+    ):
+        """
+        Should decode each row group of the columnar copy once, and serve the
+        following pages of a row group from memory.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+        DATASET_CACHE.clear()
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=1")
+        self.assertEqual(rv.json()["data"], util.IRIS_DATA_ARRAY[:1])
+        reads = mock_get_bytes.call_count
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=2&page_size=1")
+        self.assertEqual(rv.json()["data"], util.IRIS_DATA_ARRAY[1:2])
+        self.assertEqual(mock_get_bytes.call_count, reads)
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=2&page_size=3&columns=Species")
+        self.assertEqual(rv.json()["data"], [[row[4]] for row in util.IRIS_DATA_ARRAY[3:4]])
+        self.assertGreater(mock_get_bytes.call_count, reads)
+
+    @mock.patch(
+        "datasets.columnar.storage.get_bytes",
+        side_effect=lambda object_name, offset=0, length=None: util.IRIS_PARQUET[
+            offset:offset + length if length else None
+        ],
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "columnar": {
+                "format": "parquet",
+                "size": len(util.IRIS_PARQUET),
+                "rows": len(util.IRIS_DATA_ARRAY),
+            },
+        },
+    )
+    def test_get_dataset_iris_csv_with_columns_from_columnar_copy(
+        self, mock_stat_dataset, mock_get_bytes
+    ):
+        """
+        Should return only the requested columns, in the requested order, read
+        from the columnar copy.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=1&page_size=2&columns=Species,SepalLengthCm")
+        result = rv.json()
+
+        expected = {
+            "columns": [
+                {"name": "Species", "featuretype": "Categorical"},
+                {"name": "SepalLengthCm", "featuretype": "Numerical"},
+            ],
+            "data": [[row[4], row[0]] for row in util.IRIS_DATA_ARRAY[:2]],
+            "filename": util.IRIS_DATASET_NAME,
+            "name": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        }
+        self.assertEqual(expected, result)
+        self.assertEqual(rv.status_code, 200)
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page_size=-1&columns=PetalWidthCm")
+        result = rv.json()
+
+        self.assertEqual(result["data"], [[row[3]] for row in util.IRIS_DATA_ARRAY])
+        self.assertEqual(result["columns"], [{"name": "PetalWidthCm", "featuretype": "Numerical"}])
+
+    @mock.patch(
+        "datasets.readers.storage.get_bytes",
+        return_value=util.IRIS_DATA.encode(),
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "dialect": util.IRIS_DIALECT,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+    )
+    def test_get_dataset_iris_csv_with_columns_from_csv(
+        self, mock_load_dataset, mock_stat_dataset, mock_get_bytes
+    ):
+        """
+        Should parse only the requested columns of the CSV, and return http
+        status 400 when a column does not exist.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        with mock.patch("datasets.readers.read_csv", wraps=read_csv) as mock_read_csv:
+            rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?page=2&page_size=2&columns=Species")
+        result = rv.json()
+
+        self.assertEqual(result["data"], [[row[4]] for row in util.IRIS_DATA_ARRAY[2:4]])
+        self.assertEqual(result["columns"], [{"name": "Species", "featuretype": "Categorical"}])
+        self.assertEqual(mock_read_csv.call_args.kwargs["usecols"], ["Species"])
+        mock_load_dataset.assert_not_called()
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?columns=Species,Color")
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 400)
+        self.assertEqual(result, {"message": "The specified columns do not exist: Color"})
+
+    @mock.patch(
+        "datasets.columnar.storage.get_bytes",
+        side_effect=lambda object_name, offset=0, length=None: util.IRIS_PARQUET[
+            offset:offset + length if length else None
+        ],
+    )
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+            "columnar": {
+                "format": "parquet",
+                "size": len(util.IRIS_PARQUET),
+                "rows": len(util.IRIS_DATA_ARRAY),
+            },
+        },
+    )
+    def test_get_dataset_iris_csv_with_filter(self, mock_stat_dataset, mock_get_bytes):
+        """
+        Should return the page of the rows that match the filter, and the number
+        of matching rows as total.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+        expression = "SepalLengthCm < 5 and Species in ('Iris-setosa', 'Iris-virginica')"
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}", params={"filter": expression, "page_size": 2})
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["data"], util.IRIS_DATA_ARRAY[1:3])
+        self.assertEqual(result["total"], 3)
+
+        rv = TEST_CLIENT.get(
+            f"/datasets/{dataset_name}",
+            params={"filter": expression, "page": 2, "page_size": 2, "columns": "Species"},
+        )
+        result = rv.json()
+
+        self.assertEqual(result["data"], [["Iris-setosa"]])
+        self.assertEqual(result["total"], 3)
+
+        rv = TEST_CLIENT.get(
+            f"/datasets/{dataset_name}",
+            params={
+                "filter": "PetalLengthCm > 1.4 or PetalLengthCm = 1.3",
+                "page_size": -1,
+                "columns": "SepalLengthCm",
+            },
+        )
+        result = rv.json()
+
+        self.assertEqual(result["data"], [[4.7], [4.6]])
+        self.assertEqual(result["total"], 2)
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}", params={"filter": "Species = 'Iris-versicolor'"})
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["data"], [])
+        self.assertEqual(result["total"], 0)
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    def test_get_dataset_iris_csv_with_filter_invalid(self, mock_stat_dataset):
+        """
+        Should return http status 400 when the filter is invalid, refers to a
+        column that does not exist, or does not fit the featuretype of a column.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        for expression in [
+            "SepalLengthCm >",
+            "Color = 'red'",
+            "SepalLengthCm = 'long'",
+            "Species > 'Iris-setosa'",
+        ]:
+            rv = TEST_CLIENT.get(f"/datasets/{dataset_name}", params={"filter": expression})
+            self.assertEqual(rv.status_code, 400, expression)
+            self.assertIn("message", rv.json())
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": ["x", "label"],
+            "featuretypes": ["Numerical", "Categorical"],
+            "original-filename": "sort.csv",
+            "total": 5,
+            "sha256": "sort-v1",
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=pd.DataFrame(
+            {"x": [3.0, np.nan, 1.0, 2.0, 1.0], "label": ["c", "e", "a", None, "b"]}
+        ),
+    )
+    def test_get_dataset_sorted(self, mock_load_dataset, mock_stat_dataset):
+        """
+        Should sort rows by a column, with missing values last, and reuse the
+        sort permutation for the following pages.
+        """
+        misses = metrics.get_value("sort_cache_misses_total")
+        hits = metrics.get_value("sort_cache_hits_total")
+
+        rv = TEST_CLIENT.get("/datasets/sort.csv?sort=x&page=1&page_size=2")
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["data"], [[1.0, "a"], [1.0, "b"]])
+        self.assertEqual(result["total"], 5)
+
+        rv = TEST_CLIENT.get("/datasets/sort.csv?sort=x&page=2&page_size=2")
+        result = rv.json()
+
+        self.assertEqual(result["data"], [[2.0, "NaN"], [3.0, "c"]])
+        self.assertEqual(metrics.get_value("sort_cache_misses_total"), misses + 1)
+        self.assertEqual(metrics.get_value("sort_cache_hits_total"), hits + 1)
+
+        rv = TEST_CLIENT.get("/datasets/sort.csv?sort=label&order=desc&page_size=-1&columns=label")
+        result = rv.json()
+
+        self.assertEqual(result["data"], [["e"], ["c"], ["b"], ["a"], ["NaN"]])
+
+        rv = TEST_CLIENT.get("/datasets/sort.csv", params={"sort": "x", "order": "desc", "filter": "x < 3"})
+        result = rv.json()
+
+        self.assertEqual(result["data"], [[2.0, "NaN"], [1.0, "a"], [1.0, "b"]])
+        self.assertEqual(result["total"], 3)
+        mock_load_dataset.assert_called_once_with("sort.csv")
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": ["x", "label"],
+            "featuretypes": ["Numerical", "Categorical"],
+            "original-filename": "legacy.csv",
+            "total": 3,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=pd.DataFrame({"x": [3.0, 1.0, 2.0], "label": ["c", "a", "b"]}),
+    )
+    def test_get_dataset_sorted_without_checksum(self, mock_load_dataset, mock_stat_dataset):
+        """
+        Should reuse the sort permutation of datasets ingested without a checksum.
+        """
+        self.mock_stat_object.side_effect = None
+        self.mock_stat_object.return_value = {"size": 30, "etag": "legacy-v1", "lastModified": None}
+        misses = metrics.get_value("sort_cache_misses_total")
+        hits = metrics.get_value("sort_cache_hits_total")
+
+        for page in (1, 2):
+            rv = TEST_CLIENT.get(f"/datasets/legacy.csv?sort=x&page={page}&page_size=2")
+            self.assertEqual(rv.status_code, 200)
+
+        self.assertEqual(rv.json()["data"], [[3.0, "c"]])
+        self.assertEqual(metrics.get_value("sort_cache_misses_total"), misses + 1)
+        self.assertEqual(metrics.get_value("sort_cache_hits_total"), hits + 1)
+        mock_load_dataset.assert_called_once_with("legacy.csv")
+        self.assertEqual(self.mock_stat_object.call_count, 2)
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    def test_get_dataset_sorted_invalid(self, mock_stat_dataset):
+        """
+        Should return http status 400 when the sort column does not exist or
+        the order is invalid.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        for query in ["sort=Color", "sort=Species&order=up"]:
+            rv = TEST_CLIENT.get(f"/datasets/{dataset_name}?{query}")
+            self.assertEqual(rv.status_code, 400, query)
+            self.assertIn("message", rv.json())
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": ["code", "x"],
+            "featuretypes": ["Categorical", "Numerical"],
+            "original-filename": "codes.csv",
+            "total": 3,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=pd.DataFrame({"code": ["123456789", "123456780", "007"], "x": [1.0, 2.0, 3.0]}),
+    )
+    def test_get_dataset_with_filter_on_codes(self, mock_load_dataset, mock_stat_dataset):
+        """
+        Should compare numbers with the codes of a Categorical column parsed
+        as texts exactly as they were written.
+        """
+        rv = TEST_CLIENT.get("/datasets/codes.csv", params={"filter": "code = 123456789"})
+        result = rv.json()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(result["data"], [["123456789", 1.0]])
+
+        rv = TEST_CLIENT.get("/datasets/codes.csv", params={"filter": "code in (007, 123456780)"})
+        result = rv.json()
+
+        self.assertEqual(result["data"], [["123456780", 2.0], ["007", 3.0]])
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": ["a", "s"],
+            "featuretypes": ["Numerical", "Categorical"],
+            "original-filename": "missing.csv",
+            "total": 4,
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=pd.DataFrame({"a": [1.0, 2.0, None, 3.0], "s": ["x", "y", "y", None]}),
+    )
+    def test_get_dataset_with_filter_on_missing_values(self, mock_load_dataset, mock_stat_dataset):
+        """
+        Should match missing values with neither a comparison nor its
+        negation, only with "is null".
+        """
+        for expression, expected in [
+            ("a = 2", [[2.0, "y"]]),
+            ("not a = 2", [[1.0, "x"], [3.0, "NaN"]]),
+            ("not a in (1, 2)", [[3.0, "NaN"]]),
+            ("not (a = 2 or s = 'x')", []),
+            ("not (a = 1 and s = 'x')", [[2.0, "y"], ["NaN", "y"], [3.0, "NaN"]]),
+            ("not a = 2 or a is null", [[1.0, "x"], ["NaN", "y"], [3.0, "NaN"]]),
+        ]:
+            rv = TEST_CLIENT.get("/datasets/missing.csv", params={"filter": expression})
+            self.assertEqual(rv.json()["data"], expected, expression)
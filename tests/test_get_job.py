@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import unittest
+import unittest.mock as mock
+
+from fastapi.testclient import TestClient
+
+from datasets.api import app
+
+import tests.util as util
+
+TEST_CLIENT = TestClient(app)
+
+
+class TestGetJob(unittest.TestCase):
+    @mock.patch(
+        "datasets.jobs.storage.get_json",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    def test_get_job_not_found(self, mock_get_json):
+        """
+        Should raise http status 404 when given job id does not exist.
+        """
+        job_id = "UNK"
+
+        rv = TEST_CLIENT.get(f"/datasets/jobs/{job_id}")
+        result = rv.json()
+        expected = {"message": "The specified job does not exist"}
+
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 404)
+        mock_get_json.assert_any_call(f"jobs/{job_id}.json")
+
+    @mock.patch(
+        "datasets.jobs.storage.get_json",
+        return_value=util.INGEST_JOB,
+    )
+    def test_get_job_success(self, mock_get_json):
+        """
+        Should return the job details stored by the worker that ran it.
+        """
+        job_id = util.INGEST_JOB["id"]
+
+        rv = TEST_CLIENT.get(f"/datasets/jobs/{job_id}")
+        result = rv.json()
+
+        self.assertDictEqual(util.INGEST_JOB, result)
+        self.assertEqual(rv.status_code, 200)
+        mock_get_json.assert_any_call(f"jobs/{job_id}.json")
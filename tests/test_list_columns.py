@@ -5,6 +5,7 @@ import unittest.mock as mock
 from fastapi.testclient import TestClient
 
 from datasets.api import app
+from datasets.cache import MetadataCache
 
 import tests.util as util
 
@@ -52,3 +53,49 @@ class TestListColumns(unittest.TestCase):
         self.assertListEqual(expected, result)
         self.assertEqual(rv.status_code, 200)
         mock_stat_dataset.assert_any_call(dataset_name)
+
+    @mock.patch(
+        "datasets.columns.METADATA_CACHE",
+        MetadataCache(ttl=60, max_size=10),
+    )
+    @mock.patch(
+        "datasets.columns.update_dataset_metadata",
+    )
+    @mock.patch(
+        "datasets.columns.stat_dataset",
+        side_effect=[
+            {
+                "columns": util.IRIS_COLUMNS,
+                "featuretypes": util.IRIS_FEATURETYPES,
+                "original-filename": util.IRIS_DATASET_NAME,
+                "total": len(util.IRIS_DATA_ARRAY),
+            },
+            util.FILE_NOT_FOUND_ERROR,
+        ],
+    )
+    def test_list_columns_from_metadata_cache(
+        self, mock_stat_dataset, mock_update_dataset_metadata
+    ):
+        """
+        Should read metadata, and names that do not exist, from the storage once.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        for _ in range(3):
+            rv = TEST_CLIENT.get(f"/datasets/{dataset_name}/columns")
+            self.assertListEqual(util.IRIS_COLUMNS_FEATURETYPES, rv.json())
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}/columns/Species",
+            json={"featuretype": "Numerical"},
+        )
+        self.assertEqual(rv.status_code, 200)
+
+        rv = TEST_CLIENT.get(f"/datasets/{dataset_name}/columns")
+        self.assertEqual(rv.json()[-1], {"name": "Species", "featuretype": "Numerical"})
+
+        for _ in range(3):
+            rv = TEST_CLIENT.get("/datasets/UNK/columns")
+            self.assertEqual(rv.status_code, 404)
+
+        self.assertEqual(mock_stat_dataset.call_count, 2)
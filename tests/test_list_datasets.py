@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import unittest
 import unittest.mock as mock
+from datetime import datetime, timedelta, timezone
 
 from fastapi.testclient import TestClient
 
 from datasets.api import app
+from datasets.catalog import REFRESH_POOL, Catalog
 
 import tests.util as util
 
@@ -12,6 +14,23 @@ TEST_CLIENT = TestClient(app)
 
 
 class TestListDatasets(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog(":memory:")
+        patcher = mock.patch("datasets.datasets.CATALOG", self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("datasets.storage.list_dataset_objects", return_value={})
+        self.mock_list_dataset_objects = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch(
+            "datasets.catalog.stat_dataset",
+            side_effect=lambda name: {"original-filename": name},
+        )
+        self.mock_stat_dataset = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @mock.patch(
         "platiagro.list_datasets",
         return_value=[util.IRIS_DATASET_NAME],
@@ -27,3 +46,212 @@ class TestListDatasets(unittest.TestCase):
         self.assertEqual(result, expected)
 
         mock_list_datasets.assert_any_call()
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=["wine.csv", "iris.csv", "iris-1.csv", "boston.csv"],
+    )
+    def test_list_datasets_with_limit_and_token(self, mock_list_datasets):
+        """
+        Should list datasets by name, a page at a time, and return the token of
+        the next page in the X-Continuation-Token header.
+        """
+        rv = TEST_CLIENT.get("/datasets?limit=3")
+        result = rv.json()
+
+        expected = [{"name": "boston.csv"}, {"name": "iris-1.csv"}, {"name": "iris.csv"}]
+        self.assertEqual(result, expected)
+        self.assertEqual(rv.status_code, 200)
+        token = rv.headers["X-Continuation-Token"]
+
+        rv = TEST_CLIENT.get(f"/datasets?limit=3&token={token}")
+        result = rv.json()
+
+        expected = [{"name": "wine.csv"}]
+        self.assertEqual(result, expected)
+        self.assertNotIn("X-Continuation-Token", rv.headers)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=["wine.csv", "iris.csv", "iris-1.csv", "boston.csv"],
+    )
+    def test_list_datasets_with_prefix(self, mock_list_datasets):
+        """
+        Should list only the datasets whose name starts with the prefix.
+        """
+        rv = TEST_CLIENT.get("/datasets?prefix=iris")
+        result = rv.json()
+
+        expected = [{"name": "iris-1.csv"}, {"name": "iris.csv"}]
+        self.assertEqual(result, expected)
+        self.assertEqual(rv.status_code, 200)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=[util.IRIS_DATASET_NAME],
+    )
+    def test_list_datasets_with_metadata(self, mock_list_datasets):
+        """
+        Should list datasets with their filename, size, total, columns and times.
+        """
+        self.mock_stat_dataset.side_effect = None
+        self.mock_stat_dataset.return_value = {
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        }
+        self.mock_list_dataset_objects.return_value = {
+            util.IRIS_DATASET_NAME: {
+                "size": len(util.IRIS_DATA),
+                "lastModified": "2021-01-01T00:00:00+00:00",
+            },
+        }
+
+        rv = TEST_CLIENT.get("/datasets?include=metadata")
+        result = rv.json()
+
+        expected = [
+            {
+                "name": util.IRIS_DATASET_NAME,
+                "filename": util.IRIS_DATASET_NAME,
+                "size": len(util.IRIS_DATA),
+                "total": len(util.IRIS_DATA_ARRAY),
+                "columns": util.IRIS_COLUMNS_FEATURETYPES,
+                "createdAt": "2021-01-01T00:00:00+00:00",
+                "updatedAt": "2021-01-01T00:00:00+00:00",
+            }
+        ]
+        self.assertEqual(result, expected)
+        self.assertEqual(rv.status_code, 200)
+
+        self.mock_stat_dataset.assert_any_call(util.IRIS_DATASET_NAME)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=["iris.csv", "wine.csv"],
+    )
+    def test_list_datasets_with_column(self, mock_list_datasets):
+        """
+        Should list only the datasets that have a column with the given name.
+        """
+        self.mock_stat_dataset.side_effect = lambda name: {
+            "columns": util.IRIS_COLUMNS if name == "iris.csv" else ["Alcohol"],
+            "featuretypes": util.IRIS_FEATURETYPES if name == "iris.csv" else ["Numerical"],
+        }
+
+        rv = TEST_CLIENT.get("/datasets?column=Species")
+        result = rv.json()
+
+        expected = [{"name": "iris.csv"}]
+        self.assertEqual(result, expected)
+        self.assertEqual(rv.status_code, 200)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=["iris.csv", "wine.csv", "boston.csv"],
+    )
+    def test_list_datasets_sorted_by_size(self, mock_list_datasets):
+        """
+        Should list datasets by size, in descending order, a page at a time.
+        """
+        self.mock_list_dataset_objects.return_value = {
+            "iris.csv": {"size": 10, "lastModified": "2021-01-01T00:00:00+00:00"},
+            "wine.csv": {"size": 30, "lastModified": "2021-01-01T00:00:00+00:00"},
+            "boston.csv": {"size": 10, "lastModified": "2021-01-01T00:00:00+00:00"},
+        }
+
+        rv = TEST_CLIENT.get("/datasets?sort=size&order=desc&limit=2")
+        result = rv.json()
+
+        expected = [{"name": "wine.csv"}, {"name": "iris.csv"}]
+        self.assertEqual(result, expected)
+        token = rv.headers["X-Continuation-Token"]
+
+        rv = TEST_CLIENT.get(f"/datasets?sort=size&order=desc&limit=2&token={token}")
+        result = rv.json()
+
+        expected = [{"name": "boston.csv"}]
+        self.assertEqual(result, expected)
+        self.assertNotIn("X-Continuation-Token", rv.headers)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=[util.IRIS_DATASET_NAME],
+    )
+    def test_list_datasets_from_catalog(self, mock_list_datasets):
+        """
+        Should read the object storage once, then list datasets from the
+        catalog, with the datasets written since.
+        """
+        TEST_CLIENT.get("/datasets")
+        self.catalog.put("wine.csv", {"original-filename": "wine.csv", "size": 30})
+
+        rv = TEST_CLIENT.get("/datasets")
+        result = rv.json()
+
+        expected = [{"name": util.IRIS_DATASET_NAME}, {"name": "wine.csv"}]
+        self.assertEqual(result, expected)
+        self.assertEqual(mock_list_datasets.call_count, 1)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=[util.IRIS_DATASET_NAME, "wine.csv"],
+    )
+    def test_list_datasets_refreshes_stale_catalog(self, mock_list_datasets):
+        """
+        Should rebuild the catalog before listing once it is older than
+        CATALOG_TTL, with the datasets written and removed by other services.
+        """
+        TEST_CLIENT.get("/datasets")
+        mock_list_datasets.return_value = [util.IRIS_DATASET_NAME, "boston.csv"]
+
+        with mock.patch("datasets.catalog.CATALOG_TTL", 0):
+            rv = TEST_CLIENT.get("/datasets")
+        result = rv.json()
+
+        expected = [{"name": "boston.csv"}, {"name": util.IRIS_DATASET_NAME}]
+        self.assertEqual(result, expected)
+        self.assertEqual(mock_list_datasets.call_count, 2)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=[util.IRIS_DATASET_NAME, "wine.csv"],
+    )
+    def test_list_datasets_refreshes_aging_catalog_in_background(self, mock_list_datasets):
+        """
+        Should serve the catalog as is and rebuild it in the background once
+        it is older than half of CATALOG_TTL.
+        """
+        TEST_CLIENT.get("/datasets")
+        mock_list_datasets.return_value = [util.IRIS_DATASET_NAME, "boston.csv"]
+        reconciled_at = datetime.now(timezone.utc) - timedelta(seconds=200)
+
+        with mock.patch("datasets.catalog.CATALOG_TTL", 300), mock.patch.object(
+            Catalog, "reconciled_at", new_callable=mock.PropertyMock, return_value=reconciled_at
+        ):
+            rv = TEST_CLIENT.get("/datasets")
+        # waits for the background rebuild
+        REFRESH_POOL.submit(lambda: None).result()
+
+        expected = [{"name": util.IRIS_DATASET_NAME}, {"name": "wine.csv"}]
+        self.assertEqual(rv.json(), expected)
+
+        rv = TEST_CLIENT.get("/datasets")
+
+        expected = [{"name": "boston.csv"}, {"name": util.IRIS_DATASET_NAME}]
+        self.assertEqual(rv.json(), expected)
+        self.assertEqual(mock_list_datasets.call_count, 2)
+
+    @mock.patch(
+        "platiagro.list_datasets",
+        return_value=[util.IRIS_DATASET_NAME],
+    )
+    def test_list_datasets_invalid_parameters(self, mock_list_datasets):
+        """
+        Should return http status 400 when limit, token, include, sort or order is invalid.
+        """
+        for query in ["limit=0", "token=%25%25%25", "include=rows", "sort=rows", "order=up"]:
+            rv = TEST_CLIENT.get(f"/datasets?{query}")
+            self.assertEqual(rv.status_code, 400, query)
+            self.assertIn("message", rv.json())
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from fastapi.testclient import TestClient
+
+from datasets import metrics
+from datasets.api import app
+
+TEST_CLIENT = TestClient(app)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_metrics(self):
+        """
+        Should return counters in the Prometheus text format.
+        """
+        metrics.increment("retries_total", operation="upload")
+
+        rv = TEST_CLIENT.get("/metrics")
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn('datasets_retries_total{operation="upload"}', rv.text)
@@ -15,6 +15,12 @@ TEST_CLIENT = TestClient(app)
 class TestPatchDataset(unittest.TestCase):
     maxDiff = None
 
+    def setUp(self):
+        # datasets without a checksum are versioned by the ETag of their content
+        patcher = mock.patch("datasets.storage.stat_object", side_effect=util.FILE_NOT_FOUND_ERROR)
+        self.mock_stat_object = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @mock.patch(
         "datasets.datasets.stat_dataset",
         side_effect=util.FILE_NOT_FOUND_ERROR,
@@ -62,7 +68,7 @@ class TestPatchDataset(unittest.TestCase):
         self, mock_update_dataset_metadata, mock_load_dataset, mock_stat_dataset
     ):
         """
-        Should save metadata with given featuretypes file.
+        Should save metadata with given featuretypes file, without reading the dataset.
         """
         dataset_name = util.IRIS_DATASET_NAME
 
@@ -80,7 +86,6 @@ class TestPatchDataset(unittest.TestCase):
 
         expected = {
             "columns": util.IRIS_COLUMNS_FEATURETYPES,
-            "data": util.IRIS_DATA_ARRAY,
             "filename": dataset_name,
             "name": dataset_name,
             "total": len(util.IRIS_DATA_ARRAY),
@@ -89,7 +94,7 @@ class TestPatchDataset(unittest.TestCase):
         self.assertEqual(rv.status_code, 200)
 
         mock_stat_dataset.assert_any_call(dataset_name)
-        mock_load_dataset.assert_any_call(dataset_name)
+        mock_load_dataset.assert_not_called()
         mock_update_dataset_metadata.assert_any_call(
             name=dataset_name,
             metadata={
@@ -99,3 +104,52 @@ class TestPatchDataset(unittest.TestCase):
                 "total": len(util.IRIS_DATA_ARRAY),
             },
         )
+
+    @mock.patch(
+        "datasets.datasets.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    @mock.patch(
+        "datasets.datasets.load_dataset",
+        return_value=util.IRIS_DATAFRAME,
+    )
+    @mock.patch(
+        "datasets.datasets.update_dataset_metadata",
+    )
+    def test_patch_dataset_with_preview(
+        self, mock_update_dataset_metadata, mock_load_dataset, mock_stat_dataset
+    ):
+        """
+        Should also return the first page of the dataset when a preview is asked for.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}?preview=true",
+            files={
+                "featuretypes": (
+                    "featuretypes.txt",
+                    io.StringIO(util.IRIS_FEATURETYPES_FILE),
+                    "multipart/form-data",
+                )
+            },
+        )
+        result = rv.json()
+
+        expected = {
+            "columns": util.IRIS_COLUMNS_FEATURETYPES,
+            "data": util.IRIS_DATA_ARRAY[:10],
+            "filename": dataset_name,
+            "name": dataset_name,
+            "total": len(util.IRIS_DATA_ARRAY),
+        }
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 200)
+
+        mock_stat_dataset.assert_any_call(dataset_name)
+        mock_load_dataset.assert_any_call(dataset_name)
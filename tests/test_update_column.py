@@ -100,18 +100,13 @@ class TestUpdateColumn(unittest.TestCase):
         },
     )
     @mock.patch(
-        "datasets.columns.load_dataset",
-        return_value=util.IRIS_DATAFRAME,
-    )
-    @mock.patch(
-        "datasets.columns.save_dataset",
-        return_value=util.IRIS_DATAFRAME,
+        "datasets.columns.update_dataset_metadata",
     )
     def test_update_column_success(
-        self, mock_save_dataset, mock_load_dataset, mock_stat_dataset
+        self, mock_update_dataset_metadata, mock_stat_dataset
     ):
         """
-        Should update metadata successfully.
+        Should update metadata successfully, without rewriting the dataset.
         """
         dataset_name = util.IRIS_DATASET_NAME
         column_name = "Species"
@@ -128,14 +123,11 @@ class TestUpdateColumn(unittest.TestCase):
 
         mock_stat_dataset.assert_any_call(dataset_name)
 
-        mock_load_dataset.assert_any_call(dataset_name)
-
-        mock_save_dataset.assert_any_call(
-            dataset_name,
-            mock.ANY,
+        mock_update_dataset_metadata.assert_any_call(
+            name=dataset_name,
             metadata={
                 "columns": util.IRIS_COLUMNS,
-                "featuretypes": util.IRIS_FEATURETYPES,
+                "featuretypes": util.IRIS_FEATURETYPES[:-1] + ["Numerical"],
                 "original-filename": util.IRIS_DATASET_NAME,
                 "total": len(util.IRIS_DATA_ARRAY),
             },
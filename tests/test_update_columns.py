@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import unittest
+import unittest.mock as mock
+
+from fastapi.testclient import TestClient
+
+from datasets.api import app
+
+import tests.util as util
+
+TEST_CLIENT = TestClient(app)
+
+
+class TestUpdateColumns(unittest.TestCase):
+    @mock.patch(
+        "datasets.columns.stat_dataset",
+        side_effect=util.FILE_NOT_FOUND_ERROR,
+    )
+    def test_update_columns_dataset_not_found(self, mock_stat_dataset):
+        """
+        Should raise http status 404 when given dataset name does not exist.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}/columns",
+            json={"Species": "Numerical"},
+        )
+        result = rv.json()
+        expected = {"message": "The specified dataset does not exist"}
+
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 404)
+        mock_stat_dataset.assert_any_call(dataset_name)
+
+    @mock.patch(
+        "datasets.columns.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    @mock.patch(
+        "datasets.columns.update_dataset_metadata",
+    )
+    def test_update_columns_column_not_found(
+        self, mock_update_dataset_metadata, mock_stat_dataset
+    ):
+        """
+        Should raise http status 404 when any given column does not exist.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}/columns",
+            json={"Species": "Numerical", "col0": "Numerical"},
+        )
+        result = rv.json()
+        expected = {"message": "The specified column does not exist"}
+
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 404)
+        mock_update_dataset_metadata.assert_not_called()
+
+    @mock.patch(
+        "datasets.columns.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    @mock.patch(
+        "datasets.columns.update_dataset_metadata",
+    )
+    def test_update_columns_invalid_featuretype(
+        self, mock_update_dataset_metadata, mock_stat_dataset
+    ):
+        """
+        Should raise http status 400 when any given featuretype is invalid.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}/columns",
+            json={"SepalLengthCm": "Categorical", "Species": "Invalid"},
+        )
+        result = rv.json()
+
+        expected = {
+            "message": "featuretype must be one of DateTime, Numerical, Categorical"
+        }
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 400)
+        mock_update_dataset_metadata.assert_not_called()
+
+    def test_update_columns_invalid_body(self):
+        """
+        Should raise http status 400 when the body is not a map of featuretypes.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}/columns",
+            json=["Numerical"],
+        )
+        result = rv.json()
+
+        expected = {"message": "featuretypes must map column names to featuretypes"}
+        self.assertDictEqual(expected, result)
+        self.assertEqual(rv.status_code, 400)
+
+    @mock.patch(
+        "datasets.columns.stat_dataset",
+        return_value={
+            "columns": util.IRIS_COLUMNS,
+            "featuretypes": util.IRIS_FEATURETYPES,
+            "original-filename": util.IRIS_DATASET_NAME,
+            "total": len(util.IRIS_DATA_ARRAY),
+        },
+    )
+    @mock.patch(
+        "datasets.columns.update_dataset_metadata",
+    )
+    def test_update_columns_success(
+        self, mock_update_dataset_metadata, mock_stat_dataset
+    ):
+        """
+        Should update every given column with a single metadata write.
+        """
+        dataset_name = util.IRIS_DATASET_NAME
+        featuretypes = ["Categorical", "Numerical", "Numerical", "Numerical", "Numerical"]
+
+        rv = TEST_CLIENT.patch(
+            f"/datasets/{dataset_name}/columns",
+            json={"SepalLengthCm": "Categorical", "Species": "Numerical"},
+        )
+        result = rv.json()
+
+        expected = [
+            {"name": col, "featuretype": ftype}
+            for col, ftype in zip(util.IRIS_COLUMNS, featuretypes)
+        ]
+        self.assertListEqual(expected, result)
+        self.assertEqual(rv.status_code, 200)
+
+        mock_stat_dataset.assert_any_call(dataset_name)
+        mock_update_dataset_metadata.assert_called_once_with(
+            name=dataset_name,
+            metadata={
+                "columns": util.IRIS_COLUMNS,
+                "featuretypes": featuretypes,
+                "original-filename": util.IRIS_DATASET_NAME,
+                "total": len(util.IRIS_DATA_ARRAY),
+            },
+        )
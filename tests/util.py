@@ -93,6 +93,43 @@ IRIS_HEADERLESS_COLUMNS_FEATURETYPES = [
 
 IRIS_DATAFRAME = pd.DataFrame(IRIS_DATA_ARRAY, columns=IRIS_COLUMNS)
 
+IRIS_PARQUET = IRIS_DATAFRAME.to_parquet(index=False, row_group_size=2)
+
+INGEST_JOB = {
+    "id": "5ed9fe2c5bbd4d1e9e1e5c4c2c1f3d70",
+    "dataset": IRIS_DATASET_NAME,
+    "status": "Succeeded",
+    "createdAt": "2021-10-01T12:00:00+00:00",
+    "startedAt": "2021-10-01T12:00:00.100000+00:00",
+    "finishedAt": "2021-10-01T12:00:01.100000+00:00",
+    "timings": {"queued": 0.1, "running": 1.0},
+    "error": None,
+}
+
+IRIS_DIALECT = {
+    "sep": ",",
+    "quotechar": '"',
+    "header": True,
+    "encoding": "utf-8",
+    "compression": None,
+}
+
+IRIS_DIALECT_HEADERLESS = dict(IRIS_DIALECT, header=False)
+IRIS_DTYPES = ["float64", "float64", "float64", "float64", "object"]
+
+IRIS_INDEX = {
+    "stride": 2,
+    "offsets": [0, 90, 146],
+    "header": True,
+    "data-offset": 62,
+    "sep": ",",
+    "encoding": "utf-8",
+}
+
+TITANIC_DATASET_NAME = "titanic.csv"
+
+TITANIC_TOTAL = 891
+
 PNG_DATASET_NAME = "text.png"
 
 PNG_DATA = open(f"tests/resources/{PNG_DATASET_NAME}", "rb").read()